@@ -0,0 +1,303 @@
+"""Load benchmark for login, refresh and authenticated reads.
+
+Runs the FastAPI app from main.py in-process against a seeded SQLite stand-in
+and drives a weighted mix of endpoints from concurrent virtual users:
+
+    python -m benchmark.benchmark --duration 20 --concurrency 32 --output bench.json
+    python -m benchmark.benchmark --baseline bench.json
+
+Results are JSON on stdout (and in --output): requests per second, p50/p95/p99
+latency in ms and database statements per request, per endpoint and overall.
+With --baseline the run is compared against a saved result and the process
+exits with status 1 if any endpoint regressed beyond --tolerance.
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+DEFAULT_MIX = "login=1,refresh=2,user=6,credentials=2,logout=1"
+PASSWORD = "Benchmark@123"
+
+_statements: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar("statements", default=None)
+
+
+def _parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - {"login", "refresh", "user", "credentials", "logout"}
+    if unknown:
+        raise SystemExit(f"Unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percentile / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def _seed(users: int, credentials: int, rounds: int) -> None:
+    import bcrypt
+    from sqlalchemy import event
+
+    from database.database import SessionLocal, engine, replica_engines
+    from database.entity import Base, Credentials, Role, User, UserRoles
+
+    def count_statement(*args):
+        counter = _statements.get()
+        if counter is not None:
+            counter[0] += 1
+
+    for counted_engine in [engine, *replica_engines]:
+        event.listen(counted_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    hashed_password = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+    async with SessionLocal() as db:
+        db.add(Role(role_id=1, role_name="User"))
+        db.add_all(
+            User(user_id=user_id, user_name=f"user{user_id}", email=f"user{user_id}@bench.local", password=hashed_password)
+            for user_id in range(1, users + 1)
+        )
+        db.add_all(UserRoles(user_id=user_id, role_id=1, is_active=True) for user_id in range(1, users + 1))
+        db.add_all(
+            Credentials(
+                credential_id=uuid.uuid4(),
+                credential_name=f"credential{index}",
+                credential_value=f"value{index}",
+                created_by="benchmark",
+            )
+            for index in range(credentials)
+        )
+        await db.commit()
+
+
+class _VirtualUser:
+
+    def __init__(self, client, user_id: int, samples: dict, measure_from: float) -> None:
+        self.client = client
+        self.user_id = user_id
+        self.email = f"user{user_id}@bench.local"
+        self.samples = samples
+        self.measure_from = measure_from
+        self.access_token = None
+        self.refresh_token = None
+        self.etag = None
+
+    async def _call(self, name: str, method: str, url: str, **kwargs):
+        counter = [0]
+        token = _statements.set(counter)
+        started_at = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        finally:
+            _statements.reset(token)
+        elapsed = time.perf_counter() - started_at
+        ok = response.status_code == 304 or (response.status_code < 400 and response.json()["success"])
+        if started_at >= self.measure_from:
+            self.samples.setdefault(name, []).append((elapsed, counter[0], ok))
+        return response, ok
+
+    async def login(self):
+        response, ok = await self._call("login", "POST", "/login", json={"email": self.email, "password": PASSWORD})
+        if ok:
+            token = response.json()["data"]["token"]
+            self.access_token, self.refresh_token = token["accessToken"], token["refreshToken"]
+
+    async def refresh(self):
+        response, ok = await self._call("refresh", "POST", "/refresh", json={"refresh_token": self.refresh_token})
+        if ok:
+            token = response.json()["data"]["token"]
+            self.access_token, self.refresh_token = token["accessToken"], token["refreshToken"]
+        else:
+            await self.login()
+
+    async def user(self):
+        await self._call("user", "GET", f"/user/{self.user_id}", headers=self._auth())
+
+    async def credentials(self):
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        response, _ = await self._call("credentials", "GET", "/credentials", headers=headers)
+        self.etag = response.headers.get("ETag", self.etag)
+
+    async def logout(self):
+        await self._call("logout", "POST", "/logout", headers=self._auth())
+        await self.login()
+
+    def _auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+
+async def _drive(args, mix: dict[str, float]) -> dict:
+    import httpx
+
+    from database.database import dispose_engines
+    from main import app
+    from service.hashing import password_hasher
+    from service.login_throttle import login_throttle
+
+    # Every virtual user shares one client IP and logs in far more often than a person would
+    login_throttle.enabled = args.throttle
+    # Pin the cost to the seeded one, or calibration would rehash every user mid-run
+    password_hasher.is_pinned, password_hasher.rounds = True, args.bcrypt_rounds
+    try:
+        await _seed(args.users, args.credentials, args.bcrypt_rounds)
+        # Replicas are snapshots of the seeded primary: reads of seeded rows match,
+        # and everything written during the run stays on the primary.
+        for replica_path in args.replica_paths:
+            shutil.copyfile(args.primary_path, replica_path)
+        samples: dict[str, list] = {}
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                started_at = time.perf_counter()
+                measure_from = started_at + args.warmup
+                deadline = measure_from + args.duration
+
+                async def run_virtual_user(index: int):
+                    rng = random.Random(args.seed + index)
+                    virtual_user = _VirtualUser(client, index % args.users + 1, samples, measure_from)
+                    await virtual_user.login()
+                    names, weights = list(mix), list(mix.values())
+                    while time.perf_counter() < deadline:
+                        await getattr(virtual_user, rng.choices(names, weights)[0])()
+
+                await asyncio.gather(*(run_virtual_user(index) for index in range(args.concurrency)))
+                elapsed = time.perf_counter() - measure_from
+    finally:
+        # Open aiosqlite connections keep their threads, and the process, alive
+        await dispose_engines()
+
+    return _summarize(samples, elapsed, args, mix)
+
+
+def _summarize(samples: dict[str, list], elapsed: float, args, mix: dict[str, float]) -> dict:
+    def summary(entries: list) -> dict:
+        latencies = sorted(latency for latency, _, _ in entries)
+        return {
+            "requests": len(entries),
+            "errors": sum(1 for _, _, ok in entries if not ok),
+            "rps": round(len(entries) / elapsed, 2),
+            "p50Ms": round(_percentile(latencies, 50) * 1000, 3),
+            "p95Ms": round(_percentile(latencies, 95) * 1000, 3),
+            "p99Ms": round(_percentile(latencies, 99) * 1000, 3),
+            "statementsPerRequest": round(sum(count for _, count, _ in entries) / len(entries), 3) if entries else 0.0,
+        }
+
+    return {
+        "config": {
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "mix": mix,
+            "seed": args.seed,
+            "bcryptRounds": args.bcrypt_rounds,
+            "throttle": args.throttle,
+            "replicas": args.replicas,
+        },
+        "endpoints": {name: summary(entries) for name, entries in sorted(samples.items())},
+        "overall": summary([entry for entries in samples.values() for entry in entries]),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """Lists endpoints whose p95 latency rose, or whose throughput fell, by more than tolerance."""
+    regressions = []
+    current = {**result["endpoints"], "overall": result["overall"]}
+    previous = {**baseline["endpoints"], "overall": baseline["overall"]}
+    for name, stats in current.items():
+        if name not in previous:
+            continue
+        before = previous[name]
+        if before["p95Ms"] and stats["p95Ms"] > before["p95Ms"] * (1 + tolerance):
+            regressions.append({"endpoint": name, "metric": "p95Ms", "baseline": before["p95Ms"], "current": stats["p95Ms"]})
+        if before["rps"] and stats["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append({"endpoint": name, "metric": "rps", "baseline": before["rps"], "current": stats["rps"]})
+        if stats["statementsPerRequest"] > before["statementsPerRequest"]:
+            regressions.append(
+                {
+                    "endpoint": name,
+                    "metric": "statementsPerRequest",
+                    "baseline": before["statementsPerRequest"],
+                    "current": stats["statementsPerRequest"],
+                }
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--users", type=int, default=50, help="seeded user accounts")
+    parser.add_argument("--credentials", type=int, default=20, help="seeded credentials rows")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the request mix")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="bcrypt cost of seeded passwords")
+    parser.add_argument("--throttle", action="store_true", help="keep login throttling on")
+    parser.add_argument(
+        "--database-url", help="SQLite URL only, its tables are dropped; defaults to a fresh file in a temp directory"
+    )
+    parser.add_argument("--replicas", type=int, default=0, help="SQLite read replicas (default database only)")
+    parser.add_argument("--output", help="write the JSON result here")
+    parser.add_argument("--baseline", help="compare against a saved JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args()
+    mix = _parse_mix(args.mix)
+    # _seed drops every table first, so never point it at a real database
+    if args.database_url and not args.database_url.startswith("sqlite"):
+        parser.error("--database-url must be a SQLite URL")
+    if args.replicas and args.database_url:
+        parser.error("--replicas needs the default SQLite database")
+
+    from cryptography.fernet import Fernet
+
+    from benchmark.stub_webhook import start_stub_webhook
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # All of these are read when the app modules are imported, so set them first.
+        args.primary_path = os.path.join(temp_dir, "benchmark.db")
+        args.replica_paths = [os.path.join(temp_dir, f"replica{index}.db") for index in range(args.replicas)]
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{args.primary_path}"
+        os.environ["DATABASE_REPLICA_URLS"] = ",".join(f"sqlite+aiosqlite:///{path}" for path in args.replica_paths)
+        # A throwaway signing key, never written next to real ones
+        os.environ["JWT_SIGNING_KEYS_DIR"] = os.path.join(temp_dir, "keys")
+        os.environ["JWT_GENERATE_MISSING_KEY"] = "true"
+        # Registrations go through the outbox to the stub, never to a real mailer
+        os.environ["EMAIL_ENABLED"] = "true"
+        os.environ["EMAIL_WEBHOOK_URL"] = start_stub_webhook()[1]
+        os.environ["EMAIL_OUTBOX_KEY"] = Fernet.generate_key().decode("ascii")
+        result = asyncio.run(_drive(args, mix))
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(result, json.load(baseline_file), args.tolerance)
+        result["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(result, output_file, indent=2)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
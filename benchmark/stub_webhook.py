@@ -0,0 +1,48 @@
+"""Local stand-in for the mail webhook: answers every POST with 202 (or a chosen status) and counts it.
+
+    python -m benchmark.stub_webhook --port 8025
+    EMAIL_ENABLED=true EMAIL_WEBHOOK_URL=http://127.0.0.1:8025/ \
+        EMAIL_OUTBOX_KEY=$(python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())") \
+        uvicorn main:app
+"""
+
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    status = 202
+    received = 0
+    last_body = b""
+
+    def do_POST(self):
+        type(self).last_body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        type(self).received += 1
+        self.send_response(self.status)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_webhook(port: int = 0, status: int = 202) -> tuple[ThreadingHTTPServer, str]:
+    """Starts the stub on a daemon thread and returns the server and its URL.
+
+    server.RequestHandlerClass.received counts the POSTs and last_body keeps
+    the latest payload; a status of 500
+    makes it stand in for a failing webhook.
+    """
+    handler = type("StubHandler", (_Handler,), {"status": status, "received": 0, "last_body": b""})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _Handler)
+    print(f"Stub webhook listening on http://127.0.0.1:{args.port}/")
+    server.serve_forever()
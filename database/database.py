@@ -1,77 +1,540 @@
-from sqlalchemy import URL, create_engine
-from sqlalchemy.orm import Session, sessionmaker
+import asyncio
+import configparser
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
 
-from database.entity import Credentials, Role, Token, User
+from sqlalchemy import URL, bindparam, delete, event, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql import Select
 
-DATABASE_URL = URL.create(
-    drivername="mssql+pyodbc",
+from database.entity import (
+    AuditEvent,
+    Credentials,
+    EmailOutbox,
+    RevokedAccessToken,
+    Role,
+    SchedulerLease,
+    Token,
+    User,
+    UserRoles,
+)
+from service.metrics import metrics
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+POOL_SIZE = int(config["DATABASE"]["POOL_SIZE"])
+MAX_OVERFLOW = int(config["DATABASE"]["MAX_OVERFLOW"])
+POOL_RECYCLE_SECONDS = int(config["DATABASE"]["POOL_RECYCLE_SECONDS"])
+POOL_TIMEOUT_SECONDS = int(config["DATABASE"]["POOL_TIMEOUT_SECONDS"])
+PREWARM_CONNECTIONS = int(config["DATABASE"]["PREWARM_CONNECTIONS"])
+REPLICA_COOLDOWN_SECONDS = float(config["DATABASE"]["REPLICA_COOLDOWN_SECONDS"])
+
+# DATABASE_URL lets tests and local runs point at a file-backed stand-in,
+# e.g. sqlite+aiosqlite:///./interopae.db
+DATABASE_URL = os.getenv("DATABASE_URL") or URL.create(
+    drivername="mssql+aioodbc",
     username="interopae_dev",
     password="User@PwCAdmin",
     host="tcp:interopae-dev.database.windows.net",
     database="InteropAE",
     query={"driver": "ODBC Driver 17 for SQL Server"},
 )
+# Comma-separated read replica URLs; DATABASE_REPLICA_URLS overrides the config,
+# e.g. two sqlite+aiosqlite files standing in for a primary and a replica
+REPLICA_URLS = [
+    url.strip()
+    for url in (os.getenv("DATABASE_REPLICA_URLS") or config["DATABASE"]["REPLICA_URLS"]).split(",")
+    if url.strip()
+]
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.pool_wait.observe(time.perf_counter() - started_at)
+
+
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info["statement_started_at"] = time.perf_counter()
+
+
+def _observe_statement(conn, cursor, statement, parameters, context, executemany):
+    # Label by leading keyword only (SELECT, INSERT, ...) to keep the series count fixed
+    operation = (statement.lstrip()[:8].split(None, 1) or ["OTHER"])[0].upper()
+    metrics.statements.observe(time.perf_counter() - conn.info.pop("statement_started_at"), operation)
+
+
+def _create_engine(url) -> AsyncEngine:
+    new_engine = create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_recycle=POOL_RECYCLE_SECONDS,
+        pool_timeout=POOL_TIMEOUT_SECONDS,
+        pool_pre_ping=True,
+    )
+    event.listen(new_engine.sync_engine, "before_cursor_execute", _start_statement_timer)
+    event.listen(new_engine.sync_engine, "after_cursor_execute", _observe_statement)
+    return new_engine
+
+
+engine = _create_engine(DATABASE_URL)
+replica_engines = [_create_engine(url) for url in REPLICA_URLS]
+metrics.add_gauge("db_pool_checked_out", "Pooled connections currently in use.", lambda: engine.pool.checkedout())
+
+
+class ReplicaRouter:
+    """Round-robin choice among healthy read replicas, falling back to the primary.
+
+    A replica that raises a connection-level error is skipped for
+    cooldown seconds, after which the next session tries it again.
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: list[AsyncEngine], cooldown: float) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self.cooldown = cooldown
+        self._next = 0
+        self._down_until = [0.0] * len(replicas)
+        self._selected = [0] * len(replicas)
+        self._failures = [0] * len(replicas)
+        self._fallbacks = 0
+        for index, replica in enumerate(replicas):
+            event.listen(replica.sync_engine, "handle_error", self._error_handler(index))
+
+    def _error_handler(self, index: int):
+        def handle_error(context):
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+                self._failures[index] += 1
+                self._down_until[index] = time.monotonic() + self.cooldown
+
+        return handle_error
+
+    def choose(self) -> AsyncEngine:
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            index = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+            if self._down_until[index] <= now:
+                self._selected[index] += 1
+                return self.replicas[index]
+        if self.replicas:
+            self._fallbacks += 1
+        return self.primary
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "replicas": [
+                {
+                    "host": replica.url.host or replica.url.database,
+                    "healthy": self._down_until[index] <= now,
+                    "selected": self._selected[index],
+                    "failures": self._failures[index],
+                }
+                for index, replica in enumerate(self.replicas)
+            ],
+            "primaryFallbacks": self._fallbacks,
+        }
+
+
+replica_router = ReplicaRouter(engine, replica_engines, REPLICA_COOLDOWN_SECONDS)
+
+
+class RoutingSession(Session):
+    """Sends plain SELECTs to a read replica and everything else to the primary.
+
+    The replica is picked once per session. After the session's first write,
+    every later statement goes to the primary too, so a request always reads
+    its own writes.
+    """
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        if not self.info.get("wrote") and not self._flushing and isinstance(clause, Select):
+            if "replica" not in self.info:
+                self.info["replica"] = replica_router.choose().sync_engine
+            return self.info["replica"]
+        self.info["wrote"] = True
+        return engine.sync_engine
+
+
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+# Request-scoped sessions; background jobs keep using the primary-only SessionLocal
+RoutedSessionLocal = async_sessionmaker(
+    sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+
+
+def hash_refresh_token(refresh_token: str) -> bytes:
+    # Only the SHA-256 digest is stored; the raw token never reaches the database.
+    return hashlib.sha256(refresh_token.encode("utf-8")).digest()
+
+
+def access_token_id(refresh_token_hash: bytes) -> str:
+    # The jti of an access token is derived from the refresh token minted with
+    # it, so revoking refresh tokens also tells us which access tokens to deny.
+    return refresh_token_hash[:16].hex()
+
+
+def _select_user_with_role(*columns):
+    # One joined statement returning plain rows: user columns plus the active role.
+    return (
+        select(User.user_id, User.user_name, User.email, *columns, Role.role_id, Role.role_name)
+        .join(UserRoles, UserRoles.user_id == User.user_id)
+        .join(Role, Role.role_id == UserRoles.role_id)
+        .where(UserRoles.is_active == True)
+        .limit(1)
+    )
+
+
+# Hot-path statements are built once with bound parameters: each call skips
+# statement construction and cache key generation, and warm_statement_cache()
+# can compile them into the engine's cache before the first request.
+_user_exists_by_email = select(User.user_id).where(User.email == bindparam("email")).limit(1)
+_user_credentials_by_email = _select_user_with_role(User.password).where(User.email == bindparam("email"))
+_user_summary_by_email = _select_user_with_role().where(User.email == bindparam("email"))
+_user_summary_by_id = _select_user_with_role().where(User.user_id == bindparam("user_id"))
+_revoke_user_refresh_tokens = (
+    update(Token)
+    .where(Token.user_id == bindparam("token_user_id"), Token.is_revoked == False)
+    .values(is_revoked=True)
+    .returning(Token.refresh_token_hash)
+    .execution_options(synchronize_session=False)
+)
+_revoke_refresh_token = (
+    update(Token)
+    .where(Token.refresh_token_hash == bindparam("token_hash"), Token.is_revoked == False)
+    .values(is_revoked=True)
+    .returning(Token.user_id, Token.expiration_time)
+    .execution_options(synchronize_session=False)
+)
+_delete_refresh_tokens = (
+    delete(Token)
+    .where(Token.user_id == bindparam("token_user_id"))
+    .returning(Token.refresh_token_hash, Token.is_revoked)
+    .execution_options(synchronize_session=False)
+)
+_credentials_version = select(
+    func.count(), func.max(Credentials.created_at), func.max(Credentials.updated_at)
+)
+
+
+async def prewarm_pool(connections: int = PREWARM_CONNECTIONS) -> int:
+    """Opens up to pool_size connections at once on the primary and each replica."""
+    connections = min(connections, POOL_SIZE)
+    if connections <= 0:
+        return 0
+    opened = await asyncio.gather(
+        *(pooled_engine.connect().start() for pooled_engine in [engine, *replica_engines] for _ in range(connections))
+    )
+    await asyncio.gather(*(conn.close() for conn in opened))
+    return connections
+
+
+async def dispose_engines() -> None:
+    """Closes the pooled connections of the primary and each replica.
+
+    aiosqlite runs every connection on its own non-daemon thread, so a process
+    that leaves them open never exits.
+    """
+    await asyncio.gather(*(pooled_engine.dispose() for pooled_engine in [engine, *replica_engines]))
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async def warm_statement_cache(db: AsyncSession, read_only: bool = False) -> None:
+    """Runs every hot-path statement once against no rows, then rolls back.
 
-def get_user_by_email(db: Session, email: str) -> User | None:
-    return db.query(User).filter(User.email == email).first()
+    Each engine keeps its own compiled cache; replicas get read_only=True,
+    which skips the UPDATE and DELETE statements.
+    """
+    warm_ups = [
+        (_user_exists_by_email, {"email": ""}),
+        (_user_credentials_by_email, {"email": ""}),
+        (_user_summary_by_email, {"email": ""}),
+        (_user_summary_by_id, {"user_id": 0}),
+        (_revoke_user_refresh_tokens, {"token_user_id": 0}),
+        (_revoke_refresh_token, {"token_hash": b""}),
+        (_delete_refresh_tokens, {"token_user_id": 0}),
+        (_credentials_version, {}),
+    ]
+    for statement, params in warm_ups:
+        if read_only and not isinstance(statement, Select):
+            continue
+        result = await db.execute(statement, params)
+        result.all()
+    await db.rollback()
 
 
-def get_user_by_id(db: Session, user_id: int) -> User | None:
-    return db.query(User).filter(User.user_id == user_id).first()
+async def user_exists_by_email(db: AsyncSession, email: str) -> bool:
+    result = await db.execute(_user_exists_by_email, {"email": email})
+    return result.first() is not None
 
 
-def create_new_user(db: Session, user: User) -> User:
+async def get_user_credentials_by_email(db: AsyncSession, email: str):
+    result = await db.execute(_user_credentials_by_email, {"email": email})
+    return result.first()
+
+
+async def get_user_summary_by_email(db: AsyncSession, email: str):
+    result = await db.execute(_user_summary_by_email, {"email": email})
+    return result.first()
+
+
+async def get_user_summary_by_id(db: AsyncSession, user_id: int):
+    result = await db.execute(_user_summary_by_id, {"user_id": user_id})
+    return result.first()
+
+
+async def create_new_user(db: AsyncSession, user: User) -> User:
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
     return user
 
 
-def get_role_by_role_name(db: Session, role_name: str):
-    return db.query(Role).filter(Role.role_name == role_name).first()
+async def create_new_users(db: AsyncSession, users: list[User]) -> list[User]:
+    db.add_all(users)
+    await db.commit()
+    return users
+
+
+async def get_existing_emails(db: AsyncSession, emails: list[str]) -> set[str]:
+    result = await db.execute(select(User.email).where(User.email.in_(emails)))
+    return set(result.scalars().all())
+
+
+async def get_role_ids_by_name(db: AsyncSession) -> dict[str, int]:
+    result = await db.execute(select(Role.role_name, Role.role_id))
+    return {row.role_name: row.role_id for row in result}
+
+
+async def get_role_by_role_name(db: AsyncSession, role_name: str) -> Role | None:
+    result = await db.execute(select(Role).where(Role.role_name == role_name))
+    return result.scalars().first()
+
+
+async def update_user_password(db: AsyncSession, user_id: int, old_password: str, new_password: str) -> bool:
+    # Conditional on the old hash, so a rehash never overwrites a password changed meanwhile.
+    result = await db.execute(
+        update(User)
+        .where(User.user_id == user_id, User.password == old_password)
+        .values(password=new_password)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
 
 
-def create_new_refresh_token(db: Session, tokens: Token) -> Token:
+async def create_new_refresh_token(db: AsyncSession, tokens: Token) -> Token:
     db.add(tokens)
-    db.commit()
-    db.refresh(tokens)
+    await db.commit()
     return tokens
 
 
-def get_valid_refresh_token(db: Session, refresh_token: str):
-    return (
-        db.query(Token)
-        .filter(
-            Token.refresh_token == refresh_token,
-            Token.is_revoked == False,
+async def replace_refresh_tokens(
+    db: AsyncSession, user_id: int, tokens: Token, revoked_until: datetime
+) -> list[str]:
+    result = await db.execute(_revoke_user_refresh_tokens, {"token_user_id": user_id})
+    revoked_jtis = [access_token_id(token_hash) for token_hash in result.scalars().all()]
+    db.add(tokens)
+    add_revoked_access_tokens(db, revoked_jtis, revoked_until)
+    await db.commit()
+    return revoked_jtis
+
+
+async def revoke_refresh_token(db: AsyncSession, refresh_token: str):
+    # Conditional update: only one of several concurrent refreshes gets the row back.
+    result = await db.execute(_revoke_refresh_token, {"token_hash": hash_refresh_token(refresh_token)})
+    return result.first()
+
+
+async def delete_refresh_tokens(db: AsyncSession, user_id: int, revoked_until: datetime) -> list[str]:
+    result = await db.execute(_delete_refresh_tokens, {"token_user_id": user_id})
+    revoked_jtis = [access_token_id(row.refresh_token_hash) for row in result if not row.is_revoked]
+    add_revoked_access_tokens(db, revoked_jtis, revoked_until)
+    await db.commit()
+    return revoked_jtis
+
+
+def add_revoked_access_tokens(db: AsyncSession, jtis: list[str], expires_at: datetime) -> None:
+    # Stored as naive local time like the other DATETIME columns, which is what
+    # the denylist sync and the purge compare against
+    if expires_at.tzinfo is not None:
+        expires_at = expires_at.astimezone().replace(tzinfo=None)
+    db.add_all(RevokedAccessToken(jti=jti, expires_at=expires_at) for jti in jtis)
+
+
+async def get_revoked_access_tokens(db: AsyncSession, after_id: int, now: datetime):
+    result = await db.execute(
+        select(RevokedAccessToken.revocation_id, RevokedAccessToken.jti, RevokedAccessToken.expires_at)
+        .where(RevokedAccessToken.revocation_id > after_id, RevokedAccessToken.expires_at > now)
+        .order_by(RevokedAccessToken.revocation_id)
+    )
+    return result.all()
+
+
+async def delete_expired_revoked_access_tokens(db: AsyncSession, now: datetime) -> int:
+    result = await db.execute(
+        delete(RevokedAccessToken)
+        .where(RevokedAccessToken.expires_at < now)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def delete_purgeable_tokens(db: AsyncSession, now: datetime, batch_size: int) -> int:
+    # Select a bounded batch of ids first so each DELETE only locks those rows.
+    result = await db.execute(
+        select(Token.token_id)
+        .where(or_(Token.is_revoked == True, Token.expiration_time < now))
+        .limit(batch_size)
+    )
+    token_ids = list(result.scalars().all())
+    if token_ids:
+        await db.execute(
+            delete(Token).where(Token.token_id.in_(token_ids)).execution_options(synchronize_session=False)
         )
-        .first()
+    await db.commit()
+    return len(token_ids)
+
+
+async def get_oldest_expiration_time(db: AsyncSession, now: datetime) -> datetime | None:
+    result = await db.execute(select(func.min(Token.expiration_time)).where(Token.expiration_time < now))
+    return result.scalar()
+
+
+async def acquire_lease(db: AsyncSession, lease_name: str, owner: str, seconds: float) -> bool:
+    now = datetime.now()
+    result = await db.execute(
+        update(SchedulerLease)
+        .where(
+            SchedulerLease.lease_name == lease_name,
+            or_(SchedulerLease.expires_at < now, SchedulerLease.owner == owner),
+        )
+        .values(owner=owner, expires_at=now + timedelta(seconds=seconds))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        await db.commit()
+        return True
+    db.add(SchedulerLease(lease_name=lease_name, owner=owner, expires_at=now + timedelta(seconds=seconds)))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another worker holds a live lease.
+        await db.rollback()
+        return False
+    return True
+
+
+async def get_credentials(db: AsyncSession) -> list[Credentials]:
+    result = await db.execute(select(Credentials))
+    return list(result.scalars().all())
+
+
+async def get_credentials_version(db: AsyncSession):
+    result = await db.execute(_credentials_version)
+    return tuple(result.one())
+
+
+async def claim_outbox_emails(db: AsyncSession, claim_id: str, now: datetime, claim_until: datetime, batch_size: int):
+    # Claiming pushes next_attempt_at forward with a conditional UPDATE, so two
+    # dispatchers polling at once never both take the same row.
+    result = await db.execute(
+        select(EmailOutbox.outbox_id)
+        .where(EmailOutbox.is_failed == False, EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(batch_size)
+    )
+    outbox_ids = list(result.scalars().all())
+    if not outbox_ids:
+        return []
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.outbox_id.in_(outbox_ids), EmailOutbox.next_attempt_at <= now)
+        .values(claimed_by=claim_id, next_attempt_at=claim_until)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    result = await db.execute(
+        select(EmailOutbox.outbox_id, EmailOutbox.recipient, EmailOutbox.subject, EmailOutbox.body, EmailOutbox.attempts)
+        .where(EmailOutbox.claimed_by == claim_id)
     )
+    return result.all()
 
 
-def get_non_revoked_token_details_by_user_id(db: Session, user_id: int):
-    return db.query(Token).filter(Token.user_id == user_id, Token.is_revoked == False).all()
+async def delete_outbox_emails(db: AsyncSession, outbox_ids: list[int]):
+    await db.execute(
+        delete(EmailOutbox).where(EmailOutbox.outbox_id.in_(outbox_ids)).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def reschedule_outbox_email(
+    db: AsyncSession, outbox_id: int, attempts: int, next_attempt_at: datetime, is_failed: bool, error: str
+):
+    values = {
+        "attempts": attempts,
+        "next_attempt_at": next_attempt_at,
+        "is_failed": is_failed,
+        "claimed_by": None,
+        "last_error": error,
+    }
+    if is_failed:
+        # The body holds the generated password in clear; a row that will never
+        # be sent keeps only its recipient and error for follow-up
+        values["body"] = ""
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.outbox_id == outbox_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
 
 
-def update_token(db: Session, token: Token):
-    db.add(token)
-    db.commit()
-    db.refresh(token)
-    return token
+# Each row binds 6 parameters and SQL Server allows 2100 per statement
+_AUDIT_ROWS_PER_INSERT = 300
 
 
-def delete_refresh_tokens(db: Session, user_id: int):
-    if not user_id:
-        db.query(Token).filter(Token.is_revoked == True).delete()
-    else:
-        db.query(Token).filter(Token.user_id == user_id).delete()
-    db.commit()
+async def insert_audit_events(db: AsyncSession, events: list[dict]) -> None:
+    # One multi-row INSERT ... VALUES per chunk, all in a single transaction
+    for start in range(0, len(events), _AUDIT_ROWS_PER_INSERT):
+        await db.execute(insert(AuditEvent).values(events[start : start + _AUDIT_ROWS_PER_INSERT]))
+    await db.commit()
 
 
-def get_credentials(db: Session):
-    return db.query(Credentials).all()
-    
+async def get_audit_events(
+    db: AsyncSession, user_id: int | None, event_type: str | None, before_id: int | None, limit: int
+):
+    # Keyset pagination: newest first, each page continues below the last event_id seen
+    query = (
+        select(
+            AuditEvent.event_id,
+            AuditEvent.event_type,
+            AuditEvent.user_id,
+            AuditEvent.email,
+            AuditEvent.client_ip,
+            AuditEvent.detail,
+            AuditEvent.occurred_at,
+        )
+        .order_by(AuditEvent.event_id.desc())
+        .limit(limit)
+    )
+    if user_id is not None:
+        query = query.where(AuditEvent.user_id == user_id)
+    if event_type:
+        query = query.where(AuditEvent.event_type == event_type)
+    if before_id is not None:
+        query = query.where(AuditEvent.event_id < before_id)
+    result = await db.execute(query)
+    return result.all()
@@ -1,5 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DATETIME, Text
-from sqlalchemy.dialects.mssql import UNIQUEIDENTIFIER
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DATETIME, Text, Uuid, LargeBinary, Index, func
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -12,9 +11,9 @@ class User(Base):
     email = Column(name="email", type_=String, unique=True, nullable=False)
     password = Column(name="password", type_=String, nullable=False)
     created_by = Column(name="created_by", type_=String, nullable=False, default="admin")
-    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default="GETDATE()")
+    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default=func.now())
     updated_by = Column(name="updated_by", type_=String, nullable=True, default="admin")
-    updated_at = Column(name="updated_at", type_=DATETIME, nullable=True, server_default="GETDATE()")
+    updated_at = Column(name="updated_at", type_=DATETIME, nullable=True, server_default=func.now())
 
     roles = relationship("UserRoles", back_populates="user")
     token = relationship("Token", back_populates="user", uselist=False)
@@ -33,9 +32,9 @@ class Role(Base):
     role_id = Column(name="role_id", type_=Integer, primary_key=True, autoincrement=True, nullable=False)
     role_name = Column(name="role_name", type_=String, nullable=False, unique=True)
     created_by = Column(name="created_by", type_=String, nullable=False, default="admin")
-    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default="GETDATE()")
+    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default=func.now())
     updated_by = Column(name="updated_by", type_=String, nullable=True, default="admin")
-    updated_at = Column(name="updated_at", type_=DATETIME, nullable=True, server_default="GETDATE()")
+    updated_at = Column(name="updated_at", type_=DATETIME, nullable=True, server_default=func.now())
 
     users = relationship("UserRoles", back_populates="role")
 
@@ -46,9 +45,9 @@ class UserRoles(Base):
     role_id = Column(ForeignKey('role.role_id'), name="role_id", type_=Integer, primary_key=True)
     is_active = Column(name="is_active", type_=Boolean, default=True)
     created_by = Column(name="created_by", type_=String, nullable=False, default="admin")
-    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default="GETDATE()")
+    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default=func.now())
     updated_by = Column(name="updated_by", type_=String, nullable=True, default="admin")
-    updated_at = Column(name="updated_at", type_=DATETIME, nullable=True, server_default="GETDATE()")
+    updated_at = Column(name="updated_at", type_=DATETIME, nullable=True, server_default=func.now())
 
     user = relationship("User", back_populates="roles")
     role = relationship("Role", back_populates="users")
@@ -58,25 +57,86 @@ class Token(Base):
     __tablename__ = 'token'
 
     token_id = Column(name="token_id", type_=Integer, primary_key=True, autoincrement=True, nullable=False)
-    refresh_token = Column(name="refresh_token", type_=String, nullable=False)
+    refresh_token_hash = Column(name="refresh_token_hash", type_=LargeBinary(32), nullable=False)
     expiration_time = Column(name="expiration_time", type_=DATETIME, nullable=False)
     user_id = Column(ForeignKey('user.user_id'), name="user_id", type_=Integer, nullable=False)
     is_revoked = Column(name="is_revoked", type_=Boolean, default=True)
     created_by = Column(name="created_by", type_=String, nullable=False, default="admin")
-    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default="GETDATE()")
+    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default=func.now())
     updated_by = Column(name="updated_by", type_=String, nullable=True, default="admin")
-    updated_at = Column(name="updated_at", type_=DATETIME, nullable=True, server_default="GETDATE()")
+    updated_at = Column(name="updated_at", type_=DATETIME, nullable=True, server_default=func.now())
 
     user = relationship("User", back_populates="token") 
 
+    __table_args__ = (
+        Index("ix_token_refresh_token_hash", "refresh_token_hash", unique=True),
+        Index("ix_token_user_id_is_revoked", "user_id", "is_revoked"),
+        Index("ix_token_expiration_time", "expiration_time"),
+    )
+
 
 class Credentials(Base):
     __tablename__ = "credentials"
 
-    credential_id = Column(name="credential_id",type_=UNIQUEIDENTIFIER,primary_key=True,server_default="NEWID()",)
+    credential_id = Column(name="credential_id",type_=Uuid,primary_key=True,server_default="NEWID()",)
     credential_name = Column(name="credential_name", type_=String, nullable=False)
     credential_value = Column(name="credential_value", type_=Text, nullable=False)
     created_by = Column(name="created_by", type_=String, nullable=False)
-    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default="GETDATE()")
+    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default=func.now())
     updated_by = Column(name="updated_by", type_=String, nullable=True)
     updated_at = Column(name="updated_at", type_=DATETIME, nullable=True)
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_lease"
+
+    lease_name = Column(name="lease_name", type_=String(64), primary_key=True, nullable=False)
+    owner = Column(name="owner", type_=String(128), nullable=False)
+    expires_at = Column(name="expires_at", type_=DATETIME, nullable=False)
+
+
+class RevokedAccessToken(Base):
+    __tablename__ = "revoked_access_token"
+
+    revocation_id = Column(name="revocation_id", type_=Integer, primary_key=True, autoincrement=True, nullable=False)
+    jti = Column(name="jti", type_=String(32), nullable=False)
+    expires_at = Column(name="expires_at", type_=DATETIME, nullable=False)
+
+    __table_args__ = (
+        Index("ix_revoked_access_token_expires_at", "expires_at"),
+    )
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    outbox_id = Column(name="outbox_id", type_=Integer, primary_key=True, autoincrement=True, nullable=False)
+    recipient = Column(name="recipient", type_=String(320), nullable=False)
+    subject = Column(name="subject", type_=String(256), nullable=False)
+    body = Column(name="body", type_=Text, nullable=False)
+    is_failed = Column(name="is_failed", type_=Boolean, nullable=False, default=False)
+    attempts = Column(name="attempts", type_=Integer, nullable=False, default=0)
+    next_attempt_at = Column(name="next_attempt_at", type_=DATETIME, nullable=False, server_default=func.now())
+    claimed_by = Column(name="claimed_by", type_=String(32), nullable=True)
+    last_error = Column(name="last_error", type_=Text, nullable=True)
+    created_at = Column(name="created_at", type_=DATETIME, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_email_outbox_is_failed_next_attempt_at", "is_failed", "next_attempt_at"),
+    )
+
+
+class AuditEvent(Base):
+    __tablename__ = "audit_event"
+
+    event_id = Column(name="event_id", type_=Integer, primary_key=True, autoincrement=True, nullable=False)
+    event_type = Column(name="event_type", type_=String(32), nullable=False)
+    user_id = Column(name="user_id", type_=Integer, nullable=True)
+    email = Column(name="email", type_=String(320), nullable=True)
+    client_ip = Column(name="client_ip", type_=String(45), nullable=True)
+    detail = Column(name="detail", type_=String(128), nullable=True)
+    occurred_at = Column(name="occurred_at", type_=DATETIME, nullable=False)
+
+    __table_args__ = (
+        Index("ix_audit_event_user_id_event_id", "user_id", "event_id"),
+    )
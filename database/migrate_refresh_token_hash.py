@@ -0,0 +1,83 @@
+"""Moves token.refresh_token to a hashed, indexed token.refresh_token_hash column.
+
+Run once per database before deploying the hashed token lookup:
+
+    python -m database.migrate_refresh_token_hash
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy import LargeBinary, column, inspect, select, table, text
+
+from database.database import engine, hash_refresh_token
+from database.entity import Token
+
+BATCH_SIZE = 1000
+
+# The plaintext column is no longer mapped on Token, so address it directly.
+legacy_token = table("token", column("token_id"), column("refresh_token"), column("refresh_token_hash"))
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(sync_conn) -> set[str]:
+    return {column["name"] for column in inspect(sync_conn).get_columns("token")}
+
+
+def _create_indexes(sync_conn) -> None:
+    for index in Token.__table__.indexes:
+        index.create(sync_conn, checkfirst=True)
+
+
+async def migrate() -> None:
+    # Each step, and each backfill batch, commits on its own: locks on token
+    # are held for one batch at a time and the transaction log never has to
+    # hold the whole backfill. A rerun after an interruption resumes with the
+    # rows that have no hash yet.
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(_columns)
+        binary_type = LargeBinary(32).compile(dialect=conn.dialect)
+        if "refresh_token_hash" not in columns:
+            logger.info("Adding token.refresh_token_hash")
+            await conn.execute(text(f"ALTER TABLE token ADD refresh_token_hash {binary_type} NULL"))
+
+    if "refresh_token" in columns:
+        logger.info("Backfilling token.refresh_token_hash")
+        last_id = 0
+        while True:
+            async with engine.begin() as conn:
+                rows = (
+                    await conn.execute(
+                        select(legacy_token.c.token_id, legacy_token.c.refresh_token)
+                        .where(legacy_token.c.token_id > last_id, legacy_token.c.refresh_token_hash.is_(None))
+                        .order_by(legacy_token.c.token_id)
+                        .limit(BATCH_SIZE)
+                    )
+                ).all()
+                if not rows:
+                    break
+                await conn.execute(
+                    text("UPDATE token SET refresh_token_hash = :hash WHERE token_id = :token_id"),
+                    [{"hash": hash_refresh_token(row.refresh_token), "token_id": row.token_id} for row in rows],
+                )
+            last_id = rows[-1].token_id
+
+        logger.info("Dropping token.refresh_token")
+        async with engine.begin() as conn:
+            await conn.execute(text("ALTER TABLE token DROP COLUMN refresh_token"))
+
+    async with engine.begin() as conn:
+        if conn.dialect.name == "mssql":
+            await conn.execute(text(f"ALTER TABLE token ALTER COLUMN refresh_token_hash {binary_type} NOT NULL"))
+
+    logger.info("Creating token indexes")
+    async with engine.begin() as conn:
+        await conn.run_sync(_create_indexes)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(migrate())
@@ -0,0 +1,48 @@
+"""Creates the tables owned by the background services.
+
+scheduler_lease (token purge lease), revoked_access_token (access token
+denylist), email_outbox (registration emails) and audit_event (login
+history). Run once per database before deploying, like the other migrations:
+
+    python -m database.migrate_service_tables
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy import not_, or_, update
+
+from database.database import engine
+from database.entity import AuditEvent, EmailOutbox, RevokedAccessToken, SchedulerLease
+
+TABLES = [SchedulerLease.__table__, RevokedAccessToken.__table__, EmailOutbox.__table__, AuditEvent.__table__]
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate() -> None:
+    # One transaction per table; checkfirst makes reruns skip what already exists
+    for service_table in TABLES:
+        logger.info(f"Creating {service_table.name} and its indexes")
+        async with engine.begin() as conn:
+            await conn.run_sync(service_table.create, checkfirst=True)
+
+    # Failed rows, and rows queued before bodies were encrypted (every Fernet
+    # token starts with "gAAAAA"), may still hold a password in clear
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            update(EmailOutbox)
+            .where(
+                or_(EmailOutbox.is_failed == True, not_(EmailOutbox.body.startswith("gAAAAA"))),
+                EmailOutbox.body != "",
+            )
+            .values(body="", is_failed=True)
+        )
+        logger.info(f"Cleared the body of {result.rowcount} failed or unencrypted outbox emails")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(migrate())
@@ -1,15 +1,50 @@
-import configparser
 from functools import wraps
 
 import jwt
 from fastapi import Request, status
 
 from models.exception import InteropAEException
+from service.denylist import access_denylist
+from service.metrics import metrics
+from service.signing_keys import key_ring
+from service.token_cache import token_cache
+
+token_cache.add_revocation_check(access_denylist.is_revoked)
+
+ACTIVE, EXPIRED, REVOKED, INVALID = "active", "expired", "revoked", "invalid"
+_STATUS_MESSAGES = {
+    EXPIRED: "Expired access token",
+    REVOKED: "Revoked access token",
+    INVALID: "Invalid access token",
+}
+
+
+def verify_access_token(token: str) -> tuple[str, dict | None]:
+    """Returns the token status and, unless it is expired or invalid, its claims.
+
+    Verified claims are served from token_cache, so repeat tokens skip the
+    signature check; no database access either way.
+    """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return ACTIVE, payload
+    try:
+        with metrics.stage("jwt_decode"):
+            verification_key = key_ring.verification_key(jwt.get_unverified_header(token).get("kid"))
+            if verification_key is None:
+                raise jwt.InvalidTokenError("Unknown signing key")
+            public_key, algorithm = verification_key
+            payload = jwt.decode(token, public_key, algorithms=[algorithm])
+    except jwt.ExpiredSignatureError:
+        return EXPIRED, None
+    except jwt.PyJWTError:
+        # Also covers InvalidKeyError, e.g. a key used with another key type's algorithm
+        return INVALID, None
+    if token_cache.is_revoked(payload):
+        return REVOKED, payload
+    token_cache.put(token, payload)
+    return ACTIVE, payload
 
-config = configparser.ConfigParser()
-config.read("config.ini")
-SECRET_KEY = config["JWT"]["SECRET_KEY"]
-ALGORITHM = config["JWT"]["ALGORITHM"]
 
 def token_required(func):
     @wraps(func)
@@ -38,19 +73,13 @@ def token_required(func):
                 status_code=status.HTTP_401_UNAUTHORIZED,
             )
         
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            request.state.user = payload
-        except jwt.ExpiredSignatureError:
-            raise InteropAEException(
-                message="Expired access token",
-                status_code=status.HTTP_401_UNAUTHORIZED,
-            )
-        except jwt.InvalidTokenError:
+        token_status, payload = verify_access_token(token)
+        if token_status != ACTIVE:
             raise InteropAEException(
-                message="Invalid access token",
+                message=_STATUS_MESSAGES[token_status],
                 status_code=status.HTTP_401_UNAUTHORIZED,
             )
+        request.state.user = payload
 
         return await func(request, *args, **kwargs)
     return wrapper
@@ -1,107 +1,217 @@
+import time
+
+# Taken before the other imports so the startup report includes them
+_import_started_at = time.perf_counter()
+
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import List
 
 from fastapi import Depends, FastAPI, Request
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.database import SessionLocal
+from database import database
+from database.database import RoutedSessionLocal, SessionLocal, replica_engines, replica_router
 from decorator.decorator import token_required
-from models.exception import InteropAEException
-from models.request import LoginReq, RefreshTokenReq, UserReq
-from models.response import ServerResponse
+from models.exception import InteropAEException, RetryLaterException
+from models.request import IntrospectBatchReq, LoginReq, RefreshTokenReq, UserReq
+from models.response import DuplexStreamingResponse, ServerJSONResponse
 from service import service
-from service.scheduler import scheduler
+from service.admission import AdmissionMiddleware, admission_controller
+from service.audit_log import audit_log
+from service.credentials_cache import credentials_cache, etag_matches
+from service.denylist import access_denylist
+from service.email_outbox import email_dispatcher
+from service.hashing import password_hasher
+from service.login_throttle import login_throttle
+from service.metrics import MetricsMiddleware, metrics
+from service.profile_cache import user_profile_cache
+from service.scheduler import scheduler, start_scheduler, token_purger
+from service.signing_keys import JWKS_MAX_AGE_SECONDS, key_ring
+from service.single_flight import refresh_flight, user_details_flight
+from service.startup import StartupReport
+from service.token_cache import token_cache
 
 logger = logging.getLogger(__name__)
 
+startup_report = StartupReport(_import_started_at)
+metrics.add_gauge(
+    "startup_ready_seconds", "Seconds from first import until the app was ready.",
+    lambda: startup_report.stats()["readyMs"] / 1000 if startup_report.ready_at else 0,
+)
+
+async def _warm_hashing():
+    await startup_report.step("hashingPool", password_hasher.prewarm())
+    await startup_report.step("bcryptCalibration", password_hasher.calibrate())
+
+async def _warm_database():
+    await startup_report.step("databasePool", database.prewarm_pool())
+    async with SessionLocal() as db:
+        await startup_report.step("statementCache", database.warm_statement_cache(db))
+    for replica in replica_engines:
+        async with AsyncSession(replica) as db:
+            await database.warm_statement_cache(db, read_only=True)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    scheduler.start()
+    await metrics.start()
+    password_hasher.start()
+    # Independent warm-ups run side by side; the app is ready when the slowest finishes
+    await asyncio.gather(
+        _warm_hashing(),
+        _warm_database(),
+        startup_report.step("denylistSync", access_denylist.sync()),
+        startup_report.step("emailDispatcher", email_dispatcher.start()),
+        startup_report.step("auditLog", audit_log.start()),
+    )
+    start_scheduler()
+    startup_report.ready()
     yield
     scheduler.shutdown()
-def get_db():
-    db = SessionLocal()
-    try:
+    # Requests have stopped by now, so this writes out every buffered event
+    await audit_log.shutdown()
+    await email_dispatcher.shutdown()
+    password_hasher.shutdown()
+    await metrics.shutdown()
+    await database.dispose_engines()
+async def get_db():
+    async with RoutedSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+# Added last so it is outermost and also times requests shed by admission control
+app.add_middleware(MetricsMiddleware, metrics=metrics)
 
 
 @app.exception_handler(InteropAEException)
 async def handle_exception(request: Request, ex: InteropAEException):
-    return JSONResponse(
-        content=ServerResponse(
-            data=ex.message, statusCode=ex.status_code, success=False
-        ).model_dump()
+    return ServerJSONResponse(
+        data=ex.message, statusCode=ex.status_code, success=False
+    )
+
+@app.exception_handler(RetryLaterException)
+async def handle_retry_later_exception(request: Request, ex: RetryLaterException):
+    return ServerJSONResponse(
+        data=ex.message,
+        statusCode=ex.status_code,
+        success=False,
+        status_code=ex.status_code,
+        headers={"Retry-After": str(ex.retry_after)},
     )
 
 @app.exception_handler(Exception)
 async def handle_exception(request: Request, ex: Exception):
     logger.error(f"\t ===== Error =====\nReason: {ex}")
-    return JSONResponse(
-        content=ServerResponse(
-            data="Server error", statusCode=500, success=False
-        ).model_dump()
+    return ServerJSONResponse(
+        data="Server error", statusCode=500, success=False
     )
 
 @app.get("/credentials", include_in_schema=False)
-async def get_credentials(db: Session = Depends(get_db)):
-    response = await service.fetch_all_credentials(db)
-    return JSONResponse(
-        content=ServerResponse(
-            data={"message": "Credentials fetched successfully!", "credentials": response},
-            statusCode=200,
-            success=True,
-        ).model_dump(),
+async def get_credentials(request: Request, db: AsyncSession = Depends(get_db)):
+    response, etag = await service.fetch_all_credentials(db)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return ServerJSONResponse(
+        data={"message": "Credentials fetched successfully!", "credentials": response},
+        statusCode=200,
+        success=True,
+        headers={"ETag": etag},
+    )
+
+@app.get("/.well-known/jwks.json", include_in_schema=False)
+async def get_jwks(request: Request):
+    headers = {"ETag": key_ring.jwks_etag, "Cache-Control": f"public, max-age={JWKS_MAX_AGE_SECONDS}"}
+    if etag_matches(request.headers.get("If-None-Match"), key_ring.jwks_etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=key_ring.jwks, media_type="application/json", headers=headers)
+
+@app.get("/stats", include_in_schema=False)
+async def get_stats():
+    return ServerJSONResponse(
+        data={
+            "startup": startup_report.stats(),
+            "admission": admission_controller.stats(),
+            "hashing": password_hasher.stats(),
+            "loginThrottle": login_throttle.stats(),
+            "tokenCache": token_cache.stats(),
+            "credentialsCache": credentials_cache.stats(),
+            "profileCache": user_profile_cache.stats(),
+            "readReplicas": replica_router.stats(),
+            "singleFlight": {"refresh": refresh_flight.stats(), "userDetails": user_details_flight.stats()},
+            "tokenPurge": token_purger.stats(),
+            "accessDenylist": access_denylist.stats(),
+            "emailOutbox": email_dispatcher.stats(),
+            "auditLog": audit_log.stats(),
+        },
+        statusCode=200,
+        success=True,
     )
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/register")
-async def register_new_user(user: UserReq, db: Session = Depends(get_db)):
+async def register_new_user(user: UserReq, db: AsyncSession = Depends(get_db)):
     print(user)
     response = await service.register_new_user(user, db)
-    return JSONResponse(
-        content=ServerResponse(
-            data={"message": "user registered sucessfully!", "user": response.model_dump()},
-            statusCode=200,
-            success=True,
-        ).model_dump(),
+    return ServerJSONResponse(
+        data={"message": "user registered sucessfully!", "user": response},
+        statusCode=200,
+        success=True,
+    )
+
+
+@app.post("/register/bulk")
+async def register_users_in_bulk(request: Request):
+    is_csv = request.headers.get("Content-Type", "").startswith("text/csv")
+    return DuplexStreamingResponse(
+        service.register_users_in_bulk(request.stream(), is_csv),
+        media_type="application/x-ndjson",
     )
 
 
 @app.post("/login")
-async def login_user_and_create_token(login: LoginReq, db: Session = Depends(get_db)):
-    response = await service.login_user(login, db)
-    return JSONResponse(
-        content=ServerResponse(
-            data={"message": "Login successful!", "token": response.model_dump()},
-            statusCode=200,
-            success=True,
-        ).model_dump(),
+async def login_user_and_create_token(request: Request, login: LoginReq, db: AsyncSession = Depends(get_db)):
+    response = await service.login_user(login, db, request.client.host if request.client else None)
+    return ServerJSONResponse(
+        data={"message": "Login successful!", "token": response},
+        statusCode=200,
+        success=True,
     )
 
 
 @app.post("/refresh")
 async def create_token_from_refresh_token(
-    refresh_token: RefreshTokenReq, db: Session = Depends(get_db)
+    request: Request, refresh_token: RefreshTokenReq, db: AsyncSession = Depends(get_db)
 ):
-    response = await service.create_access_token_from_refresh_token(refresh_token.refresh_token, db)
-    return JSONResponse(
-        content=ServerResponse(
-            data={"message": "Access token generated from refresh token", "token": response.model_dump()},
-            statusCode=200,
-            success=True,
-        ).model_dump(),
+    response = await service.create_access_token_from_refresh_token(
+        refresh_token.refresh_token, db, request.client.host if request.client else None
+    )
+    return ServerJSONResponse(
+        data={"message": "Access token generated from refresh token", "token": response},
+        statusCode=200,
+        success=True,
+    )
+
+
+@app.post("/introspect/batch")
+async def introspect_tokens(introspect: IntrospectBatchReq):
+    response = await service.introspect_tokens(introspect.tokens)
+    return ServerJSONResponse(
+        data={"message": "Tokens introspected successfully!", "tokens": response},
+        statusCode=200,
+        success=True,
     )
 
 
 @app.get("/user/{user_cred}")
 @token_required
-async def get_user_details(request: Request, user_cred: str, db: Session = Depends(get_db)):
+async def get_user_details(request: Request, user_cred: str, db: AsyncSession = Depends(get_db)):
     user = request.state.user
     if str(user["id"]) != user_cred and user["sub"] != user_cred:
         raise InteropAEException(
@@ -112,24 +222,44 @@ async def get_user_details(request: Request, user_cred: str, db: Session = Depen
             status_code=403,
         )
     response = await service.fetch_user_details(user_cred, db)
-    return JSONResponse(
-        content=ServerResponse(
-            data={"message": "User fetched successfully!", "user": response.model_dump()},
-            statusCode=200,
-            success=True,
-        ).model_dump(),
+    return ServerJSONResponse(
+        data={"message": "User fetched successfully!", "user": response},
+        statusCode=200,
+        success=True,
     )
 
 
 @app.post("/logout")
 @token_required
-async def logout_user(request: Request, db: Session = Depends(get_db)):
+async def logout_user(request: Request, db: AsyncSession = Depends(get_db)):
     user = request.state.user
-    response = await service.logout_user(user["id"], db)
-    return JSONResponse(
-        content=ServerResponse(
-            data={"message": response},
-            statusCode=200,
-            success=True,
-        ).model_dump(),
-    )
\ No newline at end of file
+    response = await service.logout_user(
+        user["id"], db, jti=user.get("jti"), client_ip=request.client.host if request.client else None
+    )
+    return ServerJSONResponse(
+        data={"message": response},
+        statusCode=200,
+        success=True,
+    )
+
+
+@app.get("/audit")
+@token_required
+async def get_audit_events(
+    request: Request,
+    userId: int | None = None,
+    eventType: str | None = None,
+    before: int | None = None,
+    limit: int | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    # Events are buffered before they are written, so the newest may take up to
+    # [AUDIT] FLUSH_SECONDS to show up
+    events, next_cursor = await service.fetch_audit_events(
+        request.state.user, db, user_id=userId, event_type=eventType, before=before, limit=limit
+    )
+    return ServerJSONResponse(
+        data={"message": "Audit events fetched successfully!", "events": events, "nextCursor": next_cursor},
+        statusCode=200,
+        success=True,
+    )
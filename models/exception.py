@@ -5,4 +5,11 @@ class InteropAEException(Exception):
 
     def __init__(self, message: Any, status_code: int) -> None:
         self.message = message
-        self.status_code = status_code
\ No newline at end of file
+        self.status_code = status_code
+
+
+class RetryLaterException(InteropAEException):
+
+    def __init__(self, message: Any, status_code: int = 503, retry_after: int = 1) -> None:
+        super().__init__(message, status_code)
+        self.retry_after = retry_after
@@ -15,3 +15,6 @@ class LoginReq(BaseModel):
 class RefreshTokenReq(BaseModel):
     refresh_token: str = Field(..., description="Refresh token")
 
+
+class IntrospectBatchReq(BaseModel):
+    tokens: list[str] = Field(..., description="Access tokens to introspect")
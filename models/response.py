@@ -1,8 +1,15 @@
 from datetime import datetime
 from enum import Enum
-from typing import Any
+from typing import Any, Mapping
 
+import orjson
 from pydantic import BaseModel, ConfigDict, Field
+from starlette.background import BackgroundTask
+from starlette.requests import ClientDisconnect
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from service.metrics import metrics
 
 
 class ServerResponse(BaseModel):
@@ -13,7 +20,7 @@ class ServerResponse(BaseModel):
     statusCode: int = Field(..., description="HTTP response status code")
     success: bool = Field(..., description="HTTP response status code") 
     timestamp: str = Field(
-        default=datetime.now().__str__(), description="current timestamp for tracking"
+        default_factory=lambda: datetime.now().__str__(), description="current timestamp for tracking"
     )
 
     class Config:
@@ -30,4 +37,73 @@ class UserRes(BaseModel):
 class TokenDetails(BaseModel):
     accessToken: str = Field(..., description="Access token")
     refreshToken: str = Field(..., description="Refresh token")
-    tokenType: str = Field(default="Bearer")
\ No newline at end of file
+    tokenType: str = Field(default="Bearer")
+
+class TokenIntrospection(BaseModel):
+    active: bool = Field(..., description="Whether the token is currently valid")
+    status: str = Field(..., description="active, expired, revoked or invalid")
+    claims: dict[str, Any] | None = Field(default=None, description="Verified token claims")
+    expiresIn: int | None = Field(default=None, description="Seconds until the token expires")
+
+class AuditEventRes(BaseModel):
+    eventId: int = Field(..., description="Event id, also the pagination cursor")
+    eventType: str = Field(..., description="login_success, login_failure, login_throttled, refresh, refresh_failure or logout")
+    userId: int | None = Field(default=None, description="User id, if the event could be tied to a user")
+    email: str | None = Field(default=None, description="Email the login was attempted with")
+    clientIp: str | None = Field(default=None, description="Client IP address")
+    detail: str | None = Field(default=None, description="Failure reason")
+    occurredAt: datetime = Field(..., description="When the event happened")
+
+
+def _encode_default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError
+
+
+class ServerJSONResponse(Response):
+    """Writes the ServerResponse envelope straight to bytes with orjson.
+
+    The wire format matches ServerResponse.model_dump(); nested pydantic
+    models in data are serialized in the same pass.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        data: Any,
+        statusCode: int,
+        success: bool,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        background: BackgroundTask | None = None,
+    ) -> None:
+        content = {
+            "data": data,
+            "statusCode": statusCode,
+            "success": success,
+            "timestamp": datetime.now().__str__(),
+        }
+        super().__init__(content=content, status_code=status_code, headers=headers, background=background)
+
+    def render(self, content: Any) -> bytes:
+        with metrics.stage("serialize"):
+            return orjson.dumps(content, default=_encode_default)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body iterator may still be reading the request body.
+
+    Starlette's StreamingResponse listens for disconnects by calling receive(),
+    which would swallow the request body chunks; here disconnects surface
+    through request.stream() raising ClientDisconnect instead.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,384 @@
+"""Pre-fork runner: several uvicorn workers sharing one listening socket.
+
+    python server.py                        # [SERVER] settings from config.ini
+    python server.py --workers 4 --port 5002
+    kill -HUP <master pid>                  # rolling restart, one worker at a time
+    curl http://127.0.0.1:5003/             # per-worker health from heartbeats
+
+The master imports main and calibrates bcrypt once before forking, so the
+workers share the app's code, its signing keys and one bcrypt cost. Each
+worker then runs the lifespan itself, pre-warming its own DB pool and bcrypt
+processes, since connections cannot cross a fork. Only worker 0 runs the
+token purge job. Restarts fork from the preloaded app, so picking up new
+code needs a new master.
+"""
+
+import argparse
+import configparser
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+SERVER_HOST = config["SERVER"]["HOST"]
+SERVER_PORT = int(config["SERVER"]["PORT"])
+SERVER_WORKERS = int(config["SERVER"]["WORKERS"])
+SERVER_STATUS_PORT = int(config["SERVER"]["STATUS_PORT"])
+SERVER_HEARTBEAT_SECONDS = float(config["SERVER"]["HEARTBEAT_SECONDS"])
+SERVER_HEARTBEAT_TIMEOUT_SECONDS = float(config["SERVER"]["HEARTBEAT_TIMEOUT_SECONDS"])
+SERVER_READY_TIMEOUT_SECONDS = float(config["SERVER"]["READY_TIMEOUT_SECONDS"])
+SERVER_GRACEFUL_TIMEOUT_SECONDS = int(config["SERVER"]["GRACEFUL_TIMEOUT_SECONDS"])
+HASHING_WORKERS = int(config["HASHING"]["WORKERS"])
+
+logger = logging.getLogger("server")
+
+
+class Worker:
+
+    def __init__(self, index: int, pid: int, heartbeat_fd: int) -> None:
+        self.index = index
+        self.pid = pid
+        self.heartbeat_fd = heartbeat_fd
+        self.started_at = time.monotonic()
+        self.last_heartbeat = self.started_at
+        self.health: dict = {}
+        # Cleared for replacements until they are ready and for workers being stopped
+        self.respawn = True
+        self.killed = False
+        self._buffer = b""
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.health.get("ready"))
+
+    def read_heartbeats(self) -> bool:
+        """Reads pending heartbeat lines; returns False once the worker closed its end."""
+        try:
+            chunk = os.read(self.heartbeat_fd, 65536)
+        except BlockingIOError:
+            return True
+        if not chunk:
+            return False
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            self.health = json.loads(line)
+            self.last_heartbeat = time.monotonic()
+        return True
+
+    def status(self) -> dict:
+        return {
+            "index": self.index,
+            "pid": self.pid,
+            "ready": self.ready,
+            "uptimeSeconds": round(time.monotonic() - self.started_at, 3),
+            "lastHeartbeatSecondsAgo": round(time.monotonic() - self.last_heartbeat, 3),
+            "health": self.health,
+        }
+
+
+def _run_worker(index: int, listener: socket.socket, heartbeat_fd: int, worker_count: int) -> None:
+    import asyncio
+
+    import uvicorn
+
+    from database.database import engine
+    from main import app, startup_report
+    from service.hashing import password_hasher
+    from service.metrics import metrics
+
+    os.environ["RUN_CLEANUP_JOBS"] = "true" if index == 0 else "false"
+    if HASHING_WORKERS == 0:
+        # Split the cores between web workers instead of each pool taking all of them
+        password_hasher.workers = max(1, (os.cpu_count() or 1) // worker_count)
+    os.set_blocking(heartbeat_fd, False)
+    server = uvicorn.Server(
+        uvicorn.Config(app, lifespan="on", timeout_graceful_shutdown=SERVER_GRACEFUL_TIMEOUT_SECONDS)
+    )
+
+    async def send_heartbeats():
+        reported_ready, reported_at = None, 0.0
+        while True:
+            # Readiness is reported at once, everything else every HEARTBEAT_SECONDS
+            if server.started != reported_ready or time.monotonic() - reported_at >= SERVER_HEARTBEAT_SECONDS:
+                heartbeat = {
+                    "worker": index,
+                    "pid": os.getpid(),
+                    "ready": server.started,
+                    "requests": metrics.requests.count(),
+                    "readyMs": startup_report.stats()["readyMs"],
+                    "dbPoolCheckedOut": engine.pool.checkedout(),
+                    "hashingQueueDepth": password_hasher.stats()["queueDepth"],
+                }
+                try:
+                    os.write(heartbeat_fd, json.dumps(heartbeat).encode("utf-8") + b"\n")
+                except BlockingIOError:
+                    pass
+                except BrokenPipeError:
+                    logger.error("Master is gone, shutting down")
+                    server.should_exit = True
+                    return
+                reported_ready, reported_at = server.started, time.monotonic()
+            await asyncio.sleep(0.1)
+
+    async def serve():
+        heartbeats = asyncio.create_task(send_heartbeats())
+        try:
+            await server.serve(sockets=[listener])
+        finally:
+            heartbeats.cancel()
+
+    asyncio.run(serve())
+
+
+class Arbiter:
+    """Forks the workers, restarts the ones that die or stop sending heartbeats, and rolls restarts on SIGHUP."""
+
+    def __init__(self, listener: socket.socket, worker_count: int, status_port: int) -> None:
+        self.listener = listener
+        self.worker_count = worker_count
+        self.status_port = status_port
+        self.workers: dict[int, Worker] = {}
+        self.selector = selectors.DefaultSelector()
+        self.status_server: HTTPServer | None = None
+        self._restart_requested = False
+        self._stopping = False
+        self._wakeup_read, self._wakeup_write = socket.socketpair()
+
+    def run(self) -> None:
+        self._wakeup_read.setblocking(False)
+        self._wakeup_write.setblocking(False)
+        self.selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+        signal.set_wakeup_fd(self._wakeup_write.fileno())
+        signal.signal(signal.SIGHUP, self._request_restart)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        # A handler (rather than the default) makes SIGCHLD wake the selector
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        if self.status_port:
+            self._start_status_server()
+
+        for index in range(self.worker_count):
+            self._spawn(index)
+        while not self._stopping:
+            self._poll(1.0)
+            if self._restart_requested:
+                self._restart_requested = False
+                self._rolling_restart()
+        self._stop_all()
+
+    def _request_restart(self, signum, frame) -> None:
+        self._restart_requested = True
+
+    def _request_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _spawn(self, index: int) -> Worker:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                os.close(read_fd)
+                self._detach_from_master()
+                _run_worker(index, self.listener, write_fd, self.worker_count)
+                exit_code = 0
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+            finally:
+                os._exit(exit_code)
+
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        worker = Worker(index, pid, read_fd)
+        self.workers[pid] = worker
+        self.selector.register(read_fd, selectors.EVENT_READ, worker)
+        logger.info(f"Started worker {index} (pid {pid})")
+        return worker
+
+    def _detach_from_master(self) -> None:
+        # Drops everything the child inherited that belongs to the master
+        signal.set_wakeup_fd(-1)
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+        for worker in self.workers.values():
+            os.close(worker.heartbeat_fd)
+        self.selector.close()
+        self._wakeup_read.close()
+        self._wakeup_write.close()
+        if self.status_server:
+            self.status_server.socket.close()
+
+    def _poll(self, timeout: float) -> None:
+        for key, _ in self.selector.select(timeout):
+            if key.data is None:
+                try:
+                    while self._wakeup_read.recv(4096):
+                        pass
+                except BlockingIOError:
+                    pass
+            elif key.data is self.status_server:
+                self.status_server.handle_request()
+            elif not key.data.read_heartbeats():
+                self.selector.unregister(key.fileobj)
+        self._reap()
+        self._check_heartbeats()
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            if worker.heartbeat_fd in self.selector.get_map():
+                self.selector.unregister(worker.heartbeat_fd)
+            os.close(worker.heartbeat_fd)
+            exit_code = os.waitstatus_to_exitcode(status)
+            if not worker.respawn or self._stopping:
+                logger.info(f"Worker {worker.index} (pid {pid}) exited with {exit_code}")
+                continue
+            logger.warning(f"Worker {worker.index} (pid {pid}) exited with {exit_code}, restarting it")
+            if time.monotonic() - worker.started_at < 1:
+                time.sleep(1)  # don't spin on a worker that crashes at start-up
+            self._spawn(worker.index)
+
+    def _check_heartbeats(self) -> None:
+        now = time.monotonic()
+        for worker in list(self.workers.values()):
+            timeout = SERVER_HEARTBEAT_TIMEOUT_SECONDS if worker.ready else SERVER_READY_TIMEOUT_SECONDS
+            if worker.killed or now - worker.last_heartbeat <= timeout:
+                continue
+            logger.error(f"Worker {worker.index} (pid {worker.pid}) sent no heartbeat for {timeout:.0f}s, killing it")
+            worker.killed = True
+            os.kill(worker.pid, signal.SIGKILL)
+
+    def _wait(self, predicate, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() > deadline:
+                return False
+            self._poll(0.1)
+        return True
+
+    def _rolling_restart(self) -> None:
+        logger.info(f"Rolling restart of {len(self.workers)} workers")
+        for old in sorted(self.workers.values(), key=lambda worker: worker.index):
+            if self._stopping:
+                return
+            new = self._spawn(old.index)
+            new.respawn = False
+            if not self._wait(lambda: new.ready or new.pid not in self.workers, SERVER_READY_TIMEOUT_SECONDS) \
+                    or new.pid not in self.workers:
+                logger.error(f"Replacement for worker {old.index} did not become ready, stopping the rolling restart")
+                if new.pid in self.workers:
+                    os.kill(new.pid, signal.SIGKILL)
+                return
+            new.respawn = True
+            self._stop([old])
+        logger.info("Rolling restart finished")
+
+    def _stop(self, workers: list[Worker]) -> None:
+        # SIGTERM lets uvicorn finish in-flight requests and run the lifespan shutdown
+        for worker in workers:
+            worker.respawn = False
+            os.kill(worker.pid, signal.SIGTERM)
+        pids = {worker.pid for worker in workers}
+        if not self._wait(lambda: not pids & self.workers.keys(), SERVER_GRACEFUL_TIMEOUT_SECONDS + 5):
+            for pid in pids & self.workers.keys():
+                logger.error(f"Worker pid {pid} did not stop in time, killing it")
+                os.kill(pid, signal.SIGKILL)
+            self._wait(lambda: not pids & self.workers.keys(), 5)
+
+    def _stop_all(self) -> None:
+        logger.info(f"Stopping {len(self.workers)} workers")
+        self._stop(list(self.workers.values()))
+        if self.status_server:
+            self.status_server.server_close()
+
+    def status(self) -> dict:
+        workers = sorted(list(self.workers.values()), key=lambda worker: worker.index)
+        return {
+            "master": os.getpid(),
+            "workers": [worker.status() for worker in workers],
+            "ready": sum(1 for worker in workers if worker.ready),
+            "expected": self.worker_count,
+        }
+
+    def _start_status_server(self) -> None:
+        arbiter = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = arbiter.status()
+                body = json.dumps(status).encode("utf-8")
+                self.send_response(200 if status["ready"] >= status["expected"] else 503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+            # Requests are answered on the master's loop, so a stalled client may only hold it this long
+            timeout = 1
+
+        # Loopback only: this is for container health checks, not for clients.
+        # Served from the select loop rather than a thread, because the master
+        # keeps forking workers and a fork must not copy a thread mid-request.
+        self.status_server = HTTPServer(("127.0.0.1", self.status_port), StatusHandler)
+        self.status_server.timeout = 0
+        self.selector.register(self.status_server, selectors.EVENT_READ, self.status_server)
+
+
+def _create_listener(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(2048)
+    return listener
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="0 means one per core")
+    parser.add_argument("--status-port", type=int, default=SERVER_STATUS_PORT, help="0 disables it")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(name)s %(levelname)s %(message)s")
+    worker_count = args.workers or os.cpu_count() or 1
+
+    # Preload before forking; workers inherit the imported app and keys
+    import main  # noqa: F401
+    from service.hashing import _calibrate, password_hasher
+
+    if not password_hasher.is_pinned:
+        # Calibrated once here, so all workers agree on the cost and never
+        # rehash each other's users
+        (rounds, seconds), _, _ = _calibrate(
+            password_hasher.target, password_hasher.min_rounds, password_hasher.max_rounds
+        )
+        password_hasher.is_pinned, password_hasher.rounds = True, rounds
+        logger.info(f"bcrypt cost {rounds} takes {seconds * 1000:.0f}ms")
+
+    listener = _create_listener(args.host, args.port)
+    logger.info(f"Listening on {args.host}:{args.port} with {worker_count} workers")
+    Arbiter(listener, worker_count, args.status_port).run()
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,202 @@
+import asyncio
+import configparser
+import math
+import time
+from collections import deque
+
+from models.response import ServerJSONResponse
+from service.metrics import metrics
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+ADMISSION_ENABLED = config["ADMISSION"].getboolean("ENABLED")
+ADMISSION_HASHING_ROUTES = [route.strip() for route in config["ADMISSION"]["HASHING_ROUTES"].split(",") if route.strip()]
+ADMISSION_HASHING_CONCURRENCY = int(config["ADMISSION"]["HASHING_CONCURRENCY"])
+ADMISSION_HASHING_MAX_QUEUE = int(config["ADMISSION"]["HASHING_MAX_QUEUE"])
+ADMISSION_HASHING_DEADLINE_SECONDS = float(config["ADMISSION"]["HASHING_DEADLINE_MS"]) / 1000
+ADMISSION_DEFAULT_CONCURRENCY = int(config["ADMISSION"]["DEFAULT_CONCURRENCY"])
+ADMISSION_DEFAULT_MAX_QUEUE = int(config["ADMISSION"]["DEFAULT_MAX_QUEUE"])
+ADMISSION_DEFAULT_DEADLINE_SECONDS = float(config["ADMISSION"]["DEFAULT_DEADLINE_MS"]) / 1000
+ADMISSION_EXEMPT_ROUTES = [route.strip() for route in config["ADMISSION"]["EXEMPT_ROUTES"].split(",") if route.strip()]
+
+# Remaining client budget in milliseconds; it can only shorten the route class deadline
+DEADLINE_HEADER = b"x-request-deadline-ms"
+
+QUEUE_FULL, DEADLINE_EXCEEDED = "queue_full", "deadline_exceeded"
+
+
+class AdmissionRejected(Exception):
+
+    def __init__(self, reason: str) -> None:
+        self.reason = reason
+
+
+class RouteClass:
+    """Concurrency limit with a bounded FIFO queue in front of it.
+
+    A released slot is handed straight to the oldest waiter, so a queued
+    request cannot be overtaken by a newer arrival. Waiters give up at
+    their deadline, and a request admitted after its deadline has passed is
+    turned away before its handler runs.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, deadline: float) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._admitted = 0
+        self._rejected = {QUEUE_FULL: 0, DEADLINE_EXCEEDED: 0}
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def acquire(self, arrived_at: float, deadline_at: float) -> None:
+        if self._active < self.concurrency and not self._waiters:
+            self._active += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self._reject(QUEUE_FULL)
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, max(0.0, deadline_at - time.monotonic()))
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as the wait ended
+                    self.release()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self._reject(DEADLINE_EXCEEDED)
+
+        now = time.monotonic()
+        if now > deadline_at:
+            self.release()
+            self._reject(DEADLINE_EXCEEDED)
+        wait = now - arrived_at
+        metrics.stages.observe(wait, f"admission_wait_{self.name}")
+        self._admitted += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _reject(self, reason: str) -> None:
+        self._rejected[reason] += 1
+        raise AdmissionRejected(reason)
+
+    @property
+    def rejected(self) -> int:
+        return sum(self._rejected.values())
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "maxQueue": self.max_queue,
+            "deadlineMs": round(self.deadline * 1000, 3),
+            "admitted": self._admitted,
+            "rejectedQueueFull": self._rejected[QUEUE_FULL],
+            "rejectedDeadline": self._rejected[DEADLINE_EXCEEDED],
+            "avgWaitMs": round(self._total_wait / self._admitted * 1000, 3) if self._admitted else 0.0,
+            "maxWaitMs": round(self._max_wait * 1000, 3),
+        }
+
+
+class AdmissionController:
+    """Maps request paths to route classes, so cheap routes never queue behind bcrypt-heavy ones."""
+
+    def __init__(self, enabled: bool, route_classes: dict[str, RouteClass], default: RouteClass, exempt: list[str]) -> None:
+        self.enabled = enabled
+        self.route_classes = route_classes
+        self.default = default
+        self.exempt = set(exempt)
+
+    def route_class(self, path: str) -> RouteClass | None:
+        if not self.enabled or path in self.exempt:
+            return None
+        return self.route_classes.get(path, self.default)
+
+    def classes(self) -> list[RouteClass]:
+        return list({id(route_class): route_class for route_class in [*self.route_classes.values(), self.default]}.values())
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, **{route_class.name: route_class.stats() for route_class in self.classes()}}
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware holding a route class slot for the whole request, body included.
+
+    Rejections are answered here, before routing or the handler run, with a
+    503 and Retry-After in the usual response envelope.
+    """
+
+    def __init__(self, app, controller: AdmissionController) -> None:
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route_class = self.controller.route_class(scope["path"])
+        if route_class is None:
+            return await self.app(scope, receive, send)
+
+        arrived_at = time.monotonic()
+        deadline_at = arrived_at + route_class.deadline
+        for name, value in scope["headers"]:
+            if name == DEADLINE_HEADER:
+                try:
+                    deadline_at = min(deadline_at, arrived_at + float(value) / 1000)
+                except ValueError:
+                    pass
+                break
+        try:
+            await route_class.acquire(arrived_at, deadline_at)
+        except AdmissionRejected as e:
+            response = ServerJSONResponse(
+                data={"message": "Server is busy, please retry shortly", "reason": e.reason},
+                statusCode=503,
+                success=False,
+                status_code=503,
+                headers={"Retry-After": str(max(1, math.ceil(route_class.deadline)))},
+            )
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release()
+
+
+_hashing = RouteClass(
+    "hashing", ADMISSION_HASHING_CONCURRENCY, ADMISSION_HASHING_MAX_QUEUE, ADMISSION_HASHING_DEADLINE_SECONDS
+)
+admission_controller = AdmissionController(
+    ADMISSION_ENABLED,
+    {route: _hashing for route in ADMISSION_HASHING_ROUTES},
+    RouteClass("default", ADMISSION_DEFAULT_CONCURRENCY, ADMISSION_DEFAULT_MAX_QUEUE, ADMISSION_DEFAULT_DEADLINE_SECONDS),
+    ADMISSION_EXEMPT_ROUTES,
+)
+for _route_class in admission_controller.classes():
+    metrics.add_gauge(
+        f"admission_{_route_class.name}_active", f"Requests running in the {_route_class.name} route class.",
+        lambda route_class=_route_class: route_class.stats()["active"],
+    )
+    metrics.add_gauge(
+        f"admission_{_route_class.name}_queued", f"Requests waiting for a {_route_class.name} slot.",
+        lambda route_class=_route_class: route_class.stats()["queued"],
+    )
+    metrics.add_counter(
+        f"admission_{_route_class.name}_rejected_total", f"{_route_class.name.capitalize()} requests shed with a 503.",
+        lambda route_class=_route_class: route_class.rejected,
+    )
@@ -0,0 +1,195 @@
+import asyncio
+import configparser
+import logging
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from database import database
+from database.database import SessionLocal
+from database.entity import AuditEvent
+from service.metrics import metrics
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+AUDIT_BATCH_SIZE = int(config["AUDIT"]["BATCH_SIZE"])
+AUDIT_FLUSH_SECONDS = float(config["AUDIT"]["FLUSH_SECONDS"])
+AUDIT_MAX_QUEUE = int(config["AUDIT"]["MAX_QUEUE"])
+AUDIT_OVERFLOW = config["AUDIT"]["OVERFLOW"]
+AUDIT_DRAIN_TIMEOUT_SECONDS = float(config["AUDIT"]["DRAIN_TIMEOUT_SECONDS"])
+
+logger = logging.getLogger(__name__)
+
+LOGIN_SUCCESS = "login_success"
+LOGIN_FAILURE = "login_failure"
+LOGIN_THROTTLED = "login_throttled"
+REFRESH = "refresh"
+REFRESH_FAILURE = "refresh_failure"
+LOGOUT = "logout"
+
+DROP_NEWEST, DROP_OLDEST = "drop_newest", "drop_oldest"
+
+# Client-supplied values are cut to their column sizes, so one long email cannot fail a whole batch
+_EMAIL_LENGTH = AuditEvent.email.type.length
+_CLIENT_IP_LENGTH = AuditEvent.client_ip.type.length
+_DETAIL_LENGTH = AuditEvent.detail.type.length
+
+
+def _truncate(value: str | None, length: int) -> str | None:
+    return value[:length] if value else value
+
+
+class AuditLog:
+    """Login history written off the request path.
+
+    record() only appends to an in-memory queue; a background task writes the
+    queue with multi-row INSERTs once batch_size events are waiting or
+    flush_seconds after the first one, so a burst of logins costs one commit
+    per batch. The queue is bounded: when it is full the overflow policy drops
+    either the new event or the oldest queued one, and drops are counted.
+    A failed write keeps its events queued and is retried; a batch the
+    database rejects outright (DataError, IntegrityError) would fail every
+    retry, so it is discarded and counted instead. shutdown() drains what is
+    left.
+    """
+
+    def __init__(self, batch_size: int, flush_seconds: float, max_queue: int, overflow: str, drain_timeout: float) -> None:
+        if overflow not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Unknown audit overflow policy {overflow!r}")
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.drain_timeout = drain_timeout
+        self._queue: deque[dict] = deque()
+        self._wakeup = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._recorded = 0
+        self._written = 0
+        self._dropped = 0
+        self._discarded = 0
+        self._flushes = 0
+        self._failed_flushes = 0
+
+    async def start(self) -> None:
+        self._closing.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        if self._task is None:
+            return
+        self._closing.set()
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Audit log did not drain in {self.drain_timeout:.0f}s, {len(self._queue)} events lost")
+        self._task = None
+
+    def record(
+        self,
+        event_type: str,
+        user_id: int | None = None,
+        email: str | None = None,
+        client_ip: str | None = None,
+        detail: str | None = None,
+    ) -> None:
+        self._recorded += 1
+        if len(self._queue) >= self.max_queue:
+            self._dropped += 1
+            if self.overflow == DROP_NEWEST:
+                return
+            self._queue.popleft()
+        self._queue.append({
+            "event_type": event_type,
+            "user_id": user_id,
+            "email": _truncate(email, _EMAIL_LENGTH),
+            "client_ip": _truncate(client_ip, _CLIENT_IP_LENGTH),
+            "detail": _truncate(detail, _DETAIL_LENGTH),
+            "occurred_at": datetime.now(),
+        })
+        # Wakes the writer for the first event (starting the flush timer) and for a full batch
+        if len(self._queue) == 1 or len(self._queue) == self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        written = 0
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            try:
+                async with SessionLocal() as db:
+                    await database.insert_audit_events(db, batch)
+            except (DataError, IntegrityError) as e:
+                self._discarded += len(batch)
+                logger.error(f"\t===== Discarded {len(batch)} audit events the database rejected =====\nReason: {e}")
+                continue
+            except BaseException:
+                self._requeue(batch)
+                raise
+            written += len(batch)
+            self._written += len(batch)
+            self._flushes += 1
+        return written
+
+    def _requeue(self, batch: list[dict]) -> None:
+        # Back at the front in order; anything past max_queue goes by the overflow policy
+        self._queue.extendleft(reversed(batch))
+        while len(self._queue) > self.max_queue:
+            self._dropped += 1
+            if self.overflow == DROP_NEWEST:
+                self._queue.pop()
+            else:
+                self._queue.popleft()
+
+    async def _run(self) -> None:
+        while not self._closing.is_set():
+            await self._wait_for_batch()
+            try:
+                await self.flush()
+            except Exception as e:
+                self._failed_flushes += 1
+                logger.error(f"\t===== Error while writing audit events =====\nReason: {e}")
+                try:
+                    await asyncio.wait_for(self._closing.wait(), self.flush_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"\t===== Error while draining audit events, {len(self._queue)} lost =====\nReason: {e}")
+
+    async def _wait_for_batch(self) -> None:
+        self._wakeup.clear()
+        if not self._queue:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+        if len(self._queue) < self.batch_size and not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queue),
+            "maxQueue": self.max_queue,
+            "overflow": self.overflow,
+            "recorded": self._recorded,
+            "written": self._written,
+            "dropped": self._dropped,
+            "discarded": self._discarded,
+            "flushes": self._flushes,
+            "failedFlushes": self._failed_flushes,
+        }
+
+
+audit_log = AuditLog(AUDIT_BATCH_SIZE, AUDIT_FLUSH_SECONDS, AUDIT_MAX_QUEUE, AUDIT_OVERFLOW, AUDIT_DRAIN_TIMEOUT_SECONDS)
+metrics.add_gauge("audit_queue_depth", "Audit events waiting to be written.", lambda: audit_log.stats()["queued"])
+metrics.add_counter("audit_events_written_total", "Audit events written to the database.", lambda: audit_log.stats()["written"])
+metrics.add_counter("audit_events_dropped_total", "Audit events dropped by the overflow policy.", lambda: audit_log.stats()["dropped"])
+metrics.add_counter(
+    "audit_events_discarded_total", "Audit events discarded because the database rejected them.",
+    lambda: audit_log.stats()["discarded"],
+)
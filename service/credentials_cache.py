@@ -0,0 +1,60 @@
+import asyncio
+import hashlib
+import json
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import database
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialsCache:
+    """Process-local copy of the credentials table, reloaded only when its version changes."""
+
+    def __init__(self) -> None:
+        self._version: tuple | None = None
+        self._credentials: dict[str, str] = {}
+        self._etag = ""
+        self._lock = asyncio.Lock()
+        self._hits = 0
+        self._reloads = 0
+
+    def invalidate(self) -> None:
+        self._version = None
+
+    async def get(self, db: AsyncSession) -> tuple[dict[str, str], str]:
+        # The version probe is a single aggregate row; the table itself is only
+        # read when the row count or newest created_at/updated_at moved.
+        version = await database.get_credentials_version(db)
+        if version == self._version:
+            self._hits += 1
+            return self._credentials, self._etag
+        async with self._lock:
+            if version != self._version:
+                credentials = await database.get_credentials(db)
+                self._credentials = {creds.credential_name: creds.credential_value for creds in credentials}
+                body = json.dumps(self._credentials, sort_keys=True).encode("utf-8")
+                self._etag = f'"{hashlib.sha256(body).hexdigest()}"'
+                self._version = version
+                self._reloads += 1
+                logger.info(f"Credentials cache reloaded with {len(self._credentials)} entries")
+        return self._credentials, self._etag
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._credentials),
+            "hits": self._hits,
+            "reloads": self._reloads,
+        }
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+credentials_cache = CredentialsCache()
@@ -0,0 +1,91 @@
+import configparser
+import logging
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+from database import database
+from database.database import SessionLocal
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+DENYLIST_SYNC_SECONDS = float(config["DENYLIST"]["SYNC_SECONDS"])
+DENYLIST_SYNC_OVERLAP_SECONDS = float(config["DENYLIST"]["SYNC_OVERLAP_SECONDS"])
+DENYLIST_BUCKET_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+class AccessTokenDenylist:
+    """In-memory set of revoked access token jtis, each dropped once its token has expired.
+
+    Lookups are a single dict probe. Entries are also filed into per-minute
+    expiry buckets so expired jtis are swept a bucket at a time. Revocations
+    made by other workers arrive through sync(), which polls the
+    revoked_access_token table.
+    """
+
+    def __init__(self, sync_overlap: float) -> None:
+        self.sync_overlap = sync_overlap
+        # Ids up to here were seen by a sync at least sync_overlap seconds ago
+        self._settled_revocation_id = 0
+        # (monotonic time, highest id seen) per sync still inside the overlap
+        self._recent_syncs: deque[tuple[float, int]] = deque()
+        self._entries: dict[str, float] = {}
+        self._buckets: dict[int, list[str]] = defaultdict(list)
+        self._last_revocation_id = 0
+        self._hits = 0
+        self._synced = 0
+
+    def add(self, jti: str, expires_at: float) -> None:
+        if expires_at <= time.time() or self._entries.get(jti, 0) >= expires_at:
+            return
+        self._entries[jti] = expires_at
+        self._buckets[int(expires_at // DENYLIST_BUCKET_SECONDS)].append(jti)
+
+    def contains(self, jti: str | None) -> bool:
+        expires_at = self._entries.get(jti)
+        if expires_at is None or expires_at <= time.time():
+            return False
+        self._hits += 1
+        return True
+
+    def is_revoked(self, payload: dict) -> bool:
+        return self.contains(payload.get("jti"))
+
+    def sweep(self) -> None:
+        now = time.time()
+        current_bucket = int(now // DENYLIST_BUCKET_SECONDS)
+        for bucket in [bucket for bucket in self._buckets if bucket < current_bucket]:
+            for jti in self._buckets.pop(bucket):
+                if self._entries.get(jti, now) < now:
+                    del self._entries[jti]
+
+    async def sync(self) -> None:
+        # Reads from the settled id rather than the last one seen: a row whose
+        # transaction committed out of id order, within sync_overlap seconds,
+        # would otherwise be skipped for good.
+        synced_at = time.monotonic()
+        while self._recent_syncs and self._recent_syncs[0][0] <= synced_at - self.sync_overlap:
+            self._settled_revocation_id = max(self._settled_revocation_id, self._recent_syncs.popleft()[1])
+        async with SessionLocal() as db:
+            rows = await database.get_revoked_access_tokens(db, self._settled_revocation_id, datetime.now())
+        for row in rows:
+            self.add(row.jti, row.expires_at.timestamp())
+            self._last_revocation_id = max(self._last_revocation_id, row.revocation_id)
+        self._recent_syncs.append((synced_at, self._last_revocation_id))
+        self._synced += len(rows)
+        self.sweep()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "buckets": len(self._buckets),
+            "hits": self._hits,
+            "synced": self._synced,
+            "lastRevocationId": self._last_revocation_id,
+            "settledRevocationId": self._settled_revocation_id,
+        }
+
+
+access_denylist = AccessTokenDenylist(DENYLIST_SYNC_OVERLAP_SECONDS)
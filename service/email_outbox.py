@@ -0,0 +1,206 @@
+import asyncio
+import configparser
+import logging
+import os
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import httpx
+from cryptography.fernet import Fernet
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import database
+from database.database import SessionLocal
+from database.entity import EmailOutbox
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+# Off by default: registration emails carry the generated password, so sending
+# them is a deliberate choice per deployment. EMAIL_ENABLED overrides the setting.
+EMAIL_ENABLED = (os.getenv("EMAIL_ENABLED") or config["EMAIL"]["ENABLED"]).lower() == "true"
+# The webhook URL and the outbox key are secrets and only come from the environment.
+EMAIL_WEBHOOK_URL = os.getenv("EMAIL_WEBHOOK_URL", "")
+# Fernet key (Fernet.generate_key()) that encrypts queued email bodies at rest
+EMAIL_OUTBOX_KEY = os.getenv("EMAIL_OUTBOX_KEY", "")
+EMAIL_CONCURRENCY = int(config["EMAIL"]["CONCURRENCY"])
+EMAIL_BATCH_SIZE = int(config["EMAIL"]["BATCH_SIZE"])
+EMAIL_POLL_SECONDS = float(config["EMAIL"]["POLL_SECONDS"])
+EMAIL_MAX_ATTEMPTS = int(config["EMAIL"]["MAX_ATTEMPTS"])
+EMAIL_BACKOFF_SECONDS = float(config["EMAIL"]["BACKOFF_SECONDS"])
+EMAIL_TIMEOUT_SECONDS = float(config["EMAIL"]["TIMEOUT_SECONDS"])
+
+logger = logging.getLogger(__name__)
+
+_password_template = None
+
+
+def _get_password_template():
+    # jinja2 is imported and the template compiled on first registration rather
+    # than at startup; after that rendering is the only per-email template work.
+    global _password_template
+    if _password_template is None:
+        from jinja2 import Environment, FileSystemLoader
+
+        templates = Environment(loader=FileSystemLoader("templates"), auto_reload=False)
+        _password_template = templates.get_template("send_password.html")
+    return _password_template
+
+
+class EmailDispatcher:
+    """Delivers email_outbox rows to the mail webhook from a background task.
+
+    When disabled, nothing is queued or sent, as before the outbox existed.
+    Queued bodies are Fernet-encrypted, so the generated password is never
+    stored in clear; a row that is given up on loses its body entirely.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        webhook_url: str,
+        encryption_key: str,
+        concurrency: int,
+        batch_size: int,
+        poll_seconds: float,
+        max_attempts: int,
+        backoff_seconds: float,
+        timeout: float,
+    ) -> None:
+        if enabled and not (webhook_url and encryption_key):
+            raise ValueError("Email delivery needs EMAIL_WEBHOOK_URL and EMAIL_OUTBOX_KEY to be set")
+        self.enabled = enabled
+        self.webhook_url = webhook_url
+        self._fernet = Fernet(encryption_key) if enabled else None
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self._client: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._sent = 0
+        self._retried = 0
+        self._failed = 0
+
+    def enqueue(self, db: AsyncSession, user_name: str, email: str, password: str) -> None:
+        """Adds the registration email to the outbox; it is sent once the caller's transaction commits."""
+        if not self.enabled:
+            return
+        html_body = _get_password_template().render(
+            name=user_name,
+            email=email,
+            password=password,
+            title="Team PwC, India"
+        )
+        body = self._fernet.encrypt(html_body.encode("utf-8")).decode("ascii")
+        db.add(EmailOutbox(recipient=email, subject="InteropAE Registration", body=body))
+
+    async def start(self) -> None:
+        if not self.enabled:
+            logger.info("Email delivery is disabled")
+            return
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Email dispatcher started with concurrency {self.concurrency}")
+
+    async def shutdown(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def notify(self) -> None:
+        if self.enabled:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while await self.dispatch_batch() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"\t===== Error while dispatching emails =====\nReason: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch_batch(self) -> int:
+        now = datetime.now()
+        # A claim outlives the worst-case batch, after which unsent rows become due again.
+        claim_until = now + timedelta(seconds=self.timeout * (self.batch_size // self.concurrency + 1) * 2)
+        async with SessionLocal() as db:
+            emails = await database.claim_outbox_emails(db, uuid4().hex, now, claim_until, self.batch_size)
+            if not emails:
+                return 0
+            semaphore = asyncio.Semaphore(self.concurrency)
+            errors = await asyncio.gather(*(self._send(semaphore, email) for email in emails))
+
+            sent_ids = [email.outbox_id for email, error in zip(emails, errors) if error is None]
+            if sent_ids:
+                await database.delete_outbox_emails(db, sent_ids)
+            for email, error in zip(emails, errors):
+                if error is None:
+                    continue
+                attempts = email.attempts + 1
+                is_failed = attempts >= self.max_attempts
+                backoff = timedelta(seconds=self.backoff_seconds * 2 ** (attempts - 1))
+                await database.reschedule_outbox_email(
+                    db, email.outbox_id, attempts, datetime.now() + backoff, is_failed, error
+                )
+                if is_failed:
+                    self._failed += 1
+                    logger.error(f"\t===== Giving up on email {email.outbox_id} =====\nReason: {error}")
+                else:
+                    self._retried += 1
+            await db.commit()
+        self._sent += len(sent_ids)
+        return len(emails)
+
+    async def _send(self, semaphore: asyncio.Semaphore, email) -> str | None:
+        async with semaphore:
+            try:
+                payload = {
+                    "to": email.recipient,
+                    "subject": email.subject,
+                    "email_body": self._fernet.decrypt(email.body).decode("utf-8")
+                }
+                response = await self._client.post(self.webhook_url, json=payload)
+                response.raise_for_status()
+            except Exception as e:
+                return str(e) or type(e).__name__
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "concurrency": self.concurrency,
+            "sent": self._sent,
+            "retried": self._retried,
+            "failed": self._failed,
+        }
+
+
+email_dispatcher = EmailDispatcher(
+    EMAIL_ENABLED,
+    EMAIL_WEBHOOK_URL,
+    EMAIL_OUTBOX_KEY,
+    EMAIL_CONCURRENCY,
+    EMAIL_BATCH_SIZE,
+    EMAIL_POLL_SECONDS,
+    EMAIL_MAX_ATTEMPTS,
+    EMAIL_BACKOFF_SECONDS,
+    EMAIL_TIMEOUT_SECONDS,
+)
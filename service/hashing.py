@@ -0,0 +1,250 @@
+import asyncio
+import configparser
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from models.exception import RetryLaterException
+from service.metrics import metrics
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+HASHING_WORKERS = int(config["HASHING"]["WORKERS"]) or os.cpu_count() or 1
+HASHING_MAX_QUEUE = int(config["HASHING"]["MAX_QUEUE"])
+HASHING_TIMEOUT_SECONDS = float(config["HASHING"]["TIMEOUT_SECONDS"])
+HASHING_TARGET_SECONDS = float(config["HASHING"]["TARGET_MS"]) / 1000
+HASHING_MIN_ROUNDS = int(config["HASHING"]["MIN_ROUNDS"])
+HASHING_MAX_ROUNDS = int(config["HASHING"]["MAX_ROUNDS"])
+# A non-zero ROUNDS pins the cost and skips calibration, e.g. to keep mixed
+# hardware from rehashing the same users back and forth.
+HASHING_ROUNDS = int(config["HASHING"]["ROUNDS"])
+
+logger = logging.getLogger(__name__)
+
+
+# Pool jobs return (result, started_at, finished_at), both read on the worker's
+# monotonic clock, which is system-wide, so the loop can split queue wait from
+# the time bcrypt itself took.
+
+
+def _hash(password: bytes, salt: bytes) -> tuple[bytes, float, float]:
+    started_at = time.monotonic()
+    hashed_password = bcrypt.hashpw(password, salt)
+    return hashed_password, started_at, time.monotonic()
+
+
+def _hash_many(passwords: list[bytes], rounds: int) -> tuple[list[bytes], float, float]:
+    started_at = time.monotonic()
+    hashed_passwords = [bcrypt.hashpw(password, bcrypt.gensalt(rounds)) for password in passwords]
+    return hashed_passwords, started_at, time.monotonic()
+
+
+def _check(password: bytes, hashed_password: bytes) -> tuple[bool, float, float]:
+    started_at = time.monotonic()
+    is_match = bcrypt.checkpw(password, hashed_password)
+    return is_match, started_at, time.monotonic()
+
+
+def _calibrate(target: float, min_rounds: int, max_rounds: int) -> tuple[tuple[int, float], float, float]:
+    started_at = time.monotonic()
+
+    def time_hash(rounds: int) -> float:
+        hash_started_at = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+        return time.perf_counter() - hash_started_at
+
+    # Each extra round doubles the work, so one probe at the cheapest cost
+    # predicts the rest; the chosen cost is then timed for the record.
+    probe = time_hash(min_rounds)
+    rounds = min(max_rounds, max(min_rounds, min_rounds + round(math.log2(target / probe))))
+    seconds = probe if rounds == min_rounds else time_hash(rounds)
+    return (rounds, seconds), started_at, time.monotonic()
+
+
+def _ping() -> None:
+    pass
+
+
+def hash_rounds(hashed_password: str) -> int:
+    # bcrypt hashes look like $2b$12$<salt+hash>; the second field is the cost
+    return int(hashed_password.split("$")[2])
+
+
+_STAGES = {
+    _hash: "bcrypt_hash",
+    _hash_many: "bcrypt_hash_batch",
+    _check: "bcrypt_check",
+    _calibrate: "bcrypt_calibrate",
+}
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded process pool so hashing never blocks the event loop."""
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        timeout: float,
+        target: float,
+        min_rounds: int,
+        max_rounds: int,
+        rounds: int,
+    ) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.target = target
+        self.min_rounds = min_rounds
+        self.max_rounds = max_rounds
+        self.is_pinned = rounds > 0
+        # Used until calibrate() has run
+        self.rounds = rounds or 12
+        self.hash_seconds = 0.0
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def start(self) -> None:
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info(f"Password hashing pool started with {self.workers} workers")
+
+    def shutdown(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def prewarm(self) -> None:
+        """Spawns every worker up front so the first logins do not pay process start-up."""
+        if self._executor is None:
+            self.start()
+        # Bypasses _submit: start-up is not queue wait and should not skew its stats
+        await asyncio.gather(*(asyncio.wrap_future(self._executor.submit(_ping)) for _ in range(self.workers)))
+
+    async def calibrate(self) -> None:
+        """Picks the bcrypt cost whose hash time on a pool worker is closest to the target."""
+        # A pinned cost is still timed, so the hash time metric is always real
+        min_rounds, max_rounds = (self.rounds, self.rounds) if self.is_pinned else (self.min_rounds, self.max_rounds)
+        self.rounds, self.hash_seconds = await self._submit(
+            _calibrate, self.target, min_rounds, max_rounds, timeout=self.timeout * 2
+        )
+        logger.info(
+            f"bcrypt cost {self.rounds} takes {self.hash_seconds * 1000:.0f}ms "
+            f"against a {self.target * 1000:.0f}ms target"
+        )
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        return hash_rounds(hashed_password) != self.rounds
+
+    async def hash_password(self, password: str, salt: bytes | None = None) -> str:
+        hashed_password = await self._submit(_hash, password.encode("utf-8"), salt or bcrypt.gensalt(self.rounds))
+        return hashed_password.decode("utf-8")
+
+    async def hash_passwords(self, passwords: list[str], rounds: int | None = None) -> list[str]:
+        """Hashes a batch as one job per worker, so it takes at most `workers` queue slots."""
+        if not passwords:
+            return []
+        rounds = rounds or self.rounds
+        slice_size = -(-len(passwords) // self.workers)
+        slices = [
+            [password.encode("utf-8") for password in passwords[start : start + slice_size]]
+            for start in range(0, len(passwords), slice_size)
+        ]
+        hashed_slices = await asyncio.gather(
+            *(
+                self._submit(_hash_many, passwords_slice, rounds, timeout=self.timeout * len(passwords_slice))
+                for passwords_slice in slices
+            )
+        )
+        return [hashed_password.decode("utf-8") for hashed_slice in hashed_slices for hashed_password in hashed_slice]
+
+    async def check_password(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(_check, password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+    async def _submit(self, fn, *args, timeout: float | None = None):
+        if self._executor is None:
+            self.start()
+        if self._pending >= self.workers + self.max_queue:
+            self._rejected += 1
+            raise RetryLaterException(
+                message={"message": "Server is busy, please retry shortly"},
+                retry_after=max(1, round(self.timeout)),
+            )
+        self._pending += 1
+        submitted_at = time.monotonic()
+        future = self._executor.submit(fn, *args)
+        # The slot is freed when the job itself finishes, not when the caller
+        # stops waiting: a timed-out bcrypt call keeps running in its worker.
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda done: self._release_soon(loop))
+        try:
+            # On timeout the wrapped future is cancelled, which only cancels a job that has not started
+            result, started_at, finished_at = await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            raise RetryLaterException(
+                message={"message": "Password hashing timed out, please retry shortly"},
+                retry_after=max(1, round(self.timeout)),
+            )
+        wait = max(0.0, started_at - submitted_at)
+        metrics.stages.observe(wait, "bcrypt_queue_wait")
+        # Only the time inside the worker; queue wait has its own stage above
+        metrics.stages.observe(finished_at - started_at, _STAGES[fn])
+        self._completed += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        return result
+
+    def _release_soon(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Done callbacks run on the executor's thread; _pending belongs to the loop
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # the loop has closed, nothing is waiting on the count any more
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "hashMs": round(self.hash_seconds * 1000, 3),
+            "targetMs": round(self.target * 1000, 3),
+            "maxQueue": self.max_queue,
+            "inFlight": min(self._pending, self.workers),
+            "queueDepth": max(0, self._pending - self.workers),
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "timedOut": self._timed_out,
+            "avgWaitMs": round(self._total_wait / self._completed * 1000, 3) if self._completed else 0.0,
+            "maxWaitMs": round(self._max_wait * 1000, 3),
+        }
+
+
+password_hasher = PasswordHasher(
+    HASHING_WORKERS,
+    HASHING_MAX_QUEUE,
+    HASHING_TIMEOUT_SECONDS,
+    HASHING_TARGET_SECONDS,
+    HASHING_MIN_ROUNDS,
+    HASHING_MAX_ROUNDS,
+    HASHING_ROUNDS,
+)
+metrics.add_gauge("bcrypt_cost", "bcrypt work factor used for new hashes.", lambda: password_hasher.rounds)
+metrics.add_gauge(
+    "bcrypt_hash_seconds", "Measured time of one hash at the chosen cost.", lambda: password_hasher.hash_seconds
+)
+metrics.add_gauge("bcrypt_queue_depth", "Hashing jobs waiting for a worker.", lambda: password_hasher.stats()["queueDepth"])
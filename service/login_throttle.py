@@ -0,0 +1,123 @@
+import configparser
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from models.exception import RetryLaterException
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+LOGIN_THROTTLE_ENABLED = config["LOGIN_THROTTLE"].getboolean("ENABLED")
+LOGIN_THROTTLE_EMAIL_BURST = int(config["LOGIN_THROTTLE"]["EMAIL_BURST"])
+LOGIN_THROTTLE_EMAIL_PER_MINUTE = float(config["LOGIN_THROTTLE"]["EMAIL_PER_MINUTE"])
+LOGIN_THROTTLE_IP_BURST = int(config["LOGIN_THROTTLE"]["IP_BURST"])
+LOGIN_THROTTLE_IP_PER_MINUTE = float(config["LOGIN_THROTTLE"]["IP_PER_MINUTE"])
+LOGIN_THROTTLE_SHARDS = int(config["LOGIN_THROTTLE"]["SHARDS"])
+LOGIN_THROTTLE_MAX_ENTRIES = int(config["LOGIN_THROTTLE"]["MAX_ENTRIES"])
+
+
+class ThrottleStore(ABC):
+    """Token bucket backend for LoginThrottle; implement this to share buckets between workers."""
+
+    @abstractmethod
+    async def acquire(self, key: str, capacity: int, refill_per_second: float) -> float:
+        """Takes one token from the bucket at key; returns 0 if it had one, else seconds until it will."""
+
+
+class InMemoryThrottleStore(ThrottleStore):
+    """Process-local token buckets in LRU shards, each capped at max_entries // shards keys."""
+
+    def __init__(self, shards: int, max_entries: int) -> None:
+        self.max_entries_per_shard = max(1, max_entries // shards)
+        self._shards: list[OrderedDict[str, tuple[float, float]]] = [OrderedDict() for _ in range(shards)]
+
+    async def acquire(self, key: str, capacity: int, refill_per_second: float) -> float:
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        tokens, updated_at = shard.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / refill_per_second
+        shard[key] = (tokens, now)
+        shard.move_to_end(key)
+        # An evicted bucket starts full again, so the least recently seen keys go first
+        if len(shard) > self.max_entries_per_shard:
+            shard.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+class LoginThrottle:
+    """Per-IP and per-email token buckets checked before any database or bcrypt work on login."""
+
+    def __init__(
+        self,
+        store: ThrottleStore,
+        enabled: bool,
+        email_burst: int,
+        email_per_minute: float,
+        ip_burst: int,
+        ip_per_minute: float,
+    ) -> None:
+        self.store = store
+        self.enabled = enabled
+        self.email_burst = email_burst
+        self.email_rate = email_per_minute / 60
+        self.ip_burst = ip_burst
+        self.ip_rate = ip_per_minute / 60
+        self._allowed = 0
+        self._throttled_by_ip = 0
+        self._throttled_by_email = 0
+
+    async def check(self, email: str, client_ip: str | None) -> None:
+        if not self.enabled:
+            return
+        # The IP bucket goes first so a sprayed IP does not also drain its targets' email buckets
+        if client_ip:
+            wait = await self.store.acquire(f"ip:{client_ip}", self.ip_burst, self.ip_rate)
+            if wait:
+                self._throttled_by_ip += 1
+                self._reject(wait)
+        wait = await self.store.acquire(f"email:{email.strip().lower()}", self.email_burst, self.email_rate)
+        if wait:
+            self._throttled_by_email += 1
+            self._reject(wait)
+        self._allowed += 1
+
+    def _reject(self, wait: float) -> None:
+        raise RetryLaterException(
+            message={
+                "message": "Too many login attempts, please retry later",
+                "token": None,
+            },
+            status_code=429,
+            retry_after=max(1, math.ceil(wait)),
+        )
+
+    def stats(self) -> dict:
+        stats = {
+            "store": type(self.store).__name__,
+            "enabled": self.enabled,
+            "allowed": self._allowed,
+            "throttledByIp": self._throttled_by_ip,
+            "throttledByEmail": self._throttled_by_email,
+        }
+        if isinstance(self.store, InMemoryThrottleStore):
+            stats["size"] = len(self.store)
+        return stats
+
+
+login_throttle = LoginThrottle(
+    InMemoryThrottleStore(LOGIN_THROTTLE_SHARDS, LOGIN_THROTTLE_MAX_ENTRIES),
+    LOGIN_THROTTLE_ENABLED,
+    LOGIN_THROTTLE_EMAIL_BURST,
+    LOGIN_THROTTLE_EMAIL_PER_MINUTE,
+    LOGIN_THROTTLE_IP_BURST,
+    LOGIN_THROTTLE_IP_PER_MINUTE,
+)
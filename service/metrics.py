@@ -0,0 +1,183 @@
+import asyncio
+import configparser
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+METRICS_LOOP_LAG_INTERVAL_SECONDS = float(config["METRICS"]["LOOP_LAG_INTERVAL_SECONDS"])
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    return ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values; observe() is a bisect and three adds."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self) -> int:
+        return sum(sum(series[:-1]) for series in self._series.values())
+
+    @contextmanager
+    def time(self, *labels: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, *labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            prefix = _format_labels(self.labelnames, labels)
+            prefix = f"{prefix}," if prefix else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            suffix = f"{{{prefix.rstrip(',')}}}" if prefix else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter read from a callback at scrape time, so nothing is tracked between scrapes."""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float], kind: str = "gauge") -> None:
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            f"{self.name} {self.read()}",
+        ]
+
+
+class Metrics:
+    """Process-wide request and stage latency histograms rendered in Prometheus text format.
+
+    Observations happen on the event loop thread (SQLAlchemy's sync hooks run
+    there too, inside its greenlet), so no locking is needed.
+    """
+
+    def __init__(self, loop_lag_interval: float) -> None:
+        self.loop_lag_interval = loop_lag_interval
+        self.requests = Histogram(
+            "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")
+        )
+        self.stages = Histogram(
+            "stage_duration_seconds", "Latency of bcrypt, JWT and serialization stages.", ("stage",)
+        )
+        self.statements = Histogram(
+            "db_statement_duration_seconds", "Database statement execution time.", ("operation",)
+        )
+        self.pool_wait = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.")
+        self.loop_lag = Histogram("event_loop_lag_seconds", "Delay of event loop wakeups past their due time.")
+        self._callbacks: list[CallbackMetric] = []
+        self._task: asyncio.Task | None = None
+
+    def stage(self, name: str):
+        return self.stages.time(name)
+
+    def add_gauge(self, name: str, documentation: str, read: Callable[[], float]) -> None:
+        self._callbacks.append(CallbackMetric(name, documentation, read))
+
+    def add_counter(self, name: str, documentation: str, read: Callable[[], float]) -> None:
+        self._callbacks.append(CallbackMetric(name, documentation, read, kind="counter"))
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._measure_loop_lag())
+
+    async def shutdown(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _measure_loop_lag(self) -> None:
+        while True:
+            due_at = time.perf_counter() + self.loop_lag_interval
+            await asyncio.sleep(self.loop_lag_interval)
+            self.loop_lag.observe(max(0.0, time.perf_counter() - due_at))
+
+    def render(self) -> str:
+        lines = []
+        for histogram in (self.requests, self.stages, self.statements, self.pool_wait, self.loop_lag):
+            lines.extend(histogram.render())
+        for callback_metric in self._callbacks:
+            lines.extend(callback_metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request until its last body chunk is sent.
+
+    Routes are labelled by their path template, so /user/{user_cred} is one
+    series however many users are looked up.
+    """
+
+    def __init__(self, app, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started_at = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.metrics.requests.observe(
+                time.perf_counter() - started_at,
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+            )
+
+
+metrics = Metrics(METRICS_LOOP_LAG_INTERVAL_SECONDS)
@@ -0,0 +1,111 @@
+import configparser
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+from models.response import UserRes
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+PROFILE_CACHE_TTL_SECONDS = float(config["PROFILE_CACHE"]["TTL_SECONDS"])
+PROFILE_CACHE_MAX_ENTRIES = int(config["PROFILE_CACHE"]["MAX_ENTRIES"])
+
+
+class ProfileStore(ABC):
+    """Key/value backend for UserProfileCache; implement this to share the cache between workers."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Any | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None: ...
+
+
+class InMemoryProfileStore(ProfileStore):
+    """Process-local TTL + LRU store."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class UserProfileCache:
+    """Read-through cache of UserRes, stored once under the user id with an email alias."""
+
+    def __init__(self, store: ProfileStore, ttl: float) -> None:
+        self.store = store
+        self.ttl = ttl
+        self._hits = 0
+        self._misses = 0
+
+    async def get_by_id(self, user_id: int | str) -> UserRes | None:
+        profile = await self.store.get(f"id:{user_id}")
+        return self._record(profile)
+
+    async def get_by_email(self, email: str) -> UserRes | None:
+        user_id = await self.store.get(f"email:{email}")
+        profile = await self.store.get(f"id:{user_id}") if user_id is not None else None
+        return self._record(profile)
+
+    async def put(self, profile: UserRes) -> None:
+        await self.store.set(f"id:{profile.userId}", profile.model_dump(), self.ttl)
+        await self.store.set(f"email:{profile.email}", profile.userId, self.ttl)
+
+    async def invalidate(self, user_id: int | str | None = None, email: str | None = None) -> None:
+        keys = []
+        if user_id is not None:
+            keys.append(f"id:{user_id}")
+        if email is not None:
+            keys.append(f"email:{email}")
+        await self.store.delete(*keys)
+
+    def _record(self, profile: dict | None) -> UserRes | None:
+        if profile is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return UserRes(**profile)
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        stats = {
+            "store": type(self.store).__name__,
+            "ttlSeconds": self.ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hitRatio": round(self._hits / lookups, 4) if lookups else 0.0,
+        }
+        if isinstance(self.store, InMemoryProfileStore):
+            stats["size"] = len(self.store)
+        return stats
+
+
+user_profile_cache = UserProfileCache(InMemoryProfileStore(PROFILE_CACHE_MAX_ENTRIES), PROFILE_CACHE_TTL_SECONDS)
@@ -1,17 +1,98 @@
+import configparser
 import logging
+import os
+import socket
+import time
+from datetime import datetime
 
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 from database import database
 from database.database import SessionLocal
+from service.denylist import DENYLIST_SYNC_SECONDS, access_denylist
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+PURGE_BATCH_SIZE = int(config["PURGE"]["BATCH_SIZE"])
+PURGE_TIME_BUDGET_SECONDS = float(config["PURGE"]["TIME_BUDGET_SECONDS"])
+PURGE_LEASE_SECONDS = float(config["PURGE"]["LEASE_SECONDS"])
 
 logger = logging.getLogger(__name__)
-def delete_revoked_refresh_tokens():
-    db: Session = SessionLocal()
-    logger.info("Cleaning up of revoked refresh tokens from database started")
-    database.delete_refresh_tokens(db, user_id=None)
-
-scheduler = BackgroundScheduler()
-scheduler.add_job(delete_revoked_refresh_tokens, CronTrigger(minute="*/1"))
-    
\ No newline at end of file
+
+
+class TokenPurger:
+    """Deletes revoked and expired refresh tokens in bounded batches under a DB lease."""
+
+    lease_name = "token_purge"
+
+    def __init__(self, batch_size: int, time_budget: float, lease_seconds: float) -> None:
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._runs = 0
+        self._skipped = 0
+        self._total_deleted = 0
+        self._last_run_at: datetime | None = None
+        self._last_deleted = 0
+        self._last_duration = 0.0
+        self._lag = 0.0
+
+    async def run(self) -> None:
+        async with SessionLocal() as db:
+            if not await database.acquire_lease(db, self.lease_name, self.owner, self.lease_seconds):
+                self._skipped += 1
+                return
+
+            logger.info("Cleaning up of revoked and expired refresh tokens from database started")
+            started_at = time.monotonic()
+            now = datetime.now()
+            deleted = 0
+            while time.monotonic() - started_at < self.time_budget:
+                batch = await database.delete_purgeable_tokens(db, now, self.batch_size)
+                deleted += batch
+                if batch < self.batch_size:
+                    break
+            oldest = await database.get_oldest_expiration_time(db, now)
+            await database.delete_expired_revoked_access_tokens(db, now)
+
+        self._runs += 1
+        self._total_deleted += deleted
+        self._last_run_at = now
+        self._last_deleted = deleted
+        self._last_duration = time.monotonic() - started_at
+        self._lag = (now - oldest).total_seconds() if oldest else 0.0
+        logger.info(f"Purged {deleted} refresh tokens in {self._last_duration:.3f}s, lag {self._lag:.0f}s")
+
+    def stats(self) -> dict:
+        return {
+            "owner": self.owner,
+            "runs": self._runs,
+            "skipped": self._skipped,
+            "totalDeleted": self._total_deleted,
+            "lastRunAt": self._last_run_at.isoformat() if self._last_run_at else None,
+            "lastDeleted": self._last_deleted,
+            "lastDurationMs": round(self._last_duration * 1000, 3),
+            "lastRowsPerSecond": round(self._last_deleted / self._last_duration, 3) if self._last_duration else 0.0,
+            "lagSeconds": round(self._lag, 3),
+        }
+
+
+token_purger = TokenPurger(PURGE_BATCH_SIZE, PURGE_TIME_BUDGET_SECONDS, PURGE_LEASE_SECONDS)
+
+scheduler = AsyncIOScheduler()
+# Every process keeps its own in-memory denylist, so the sync runs everywhere
+scheduler.add_job(access_denylist.sync, IntervalTrigger(seconds=DENYLIST_SYNC_SECONDS), max_instances=1, coalesce=True)
+
+
+def start_scheduler() -> None:
+    # server.py sets RUN_CLEANUP_JOBS=false in all of its workers but one;
+    # the purge lease still guards against overlap, e.g. during a restart.
+    if os.getenv("RUN_CLEANUP_JOBS", "true").lower() != "false":
+        scheduler.add_job(
+            token_purger.run, CronTrigger(minute="*/1"), id=TokenPurger.lease_name,
+            max_instances=1, coalesce=True, replace_existing=True,
+        )
+    scheduler.start()
@@ -1,37 +1,60 @@
+import asyncio
 import configparser
+import csv
+import json
 import logging
 import re
 import secrets
 import string
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
 from uuid import uuid4
 
-import bcrypt
-import httpx
 import jwt
-from jinja2 import Environment, FileSystemLoader
-from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import database
+from database.database import SessionLocal
 from database.entity import Role, Token, User, UserRoles
-from models.exception import InteropAEException
+from decorator.decorator import ACTIVE, INVALID, verify_access_token
+from models.exception import InteropAEException, RetryLaterException
 from models.request import LoginReq, UserReq
-from models.response import TokenDetails, UserRes
+from models.response import AuditEventRes, TokenDetails, TokenIntrospection, UserRes
+from service import audit_log as audit
+from service.audit_log import audit_log
+from service.credentials_cache import credentials_cache
+from service.denylist import access_denylist
+from service.email_outbox import email_dispatcher
+from service.hashing import password_hasher
+from service.login_throttle import login_throttle
+from service.metrics import metrics
+from service.profile_cache import user_profile_cache
+from service.signing_keys import key_ring
+from service.single_flight import refresh_flight, user_details_flight
 
 config = configparser.ConfigParser()
 config.read("config.ini")
-SECRET_KEY = config["JWT"]["SECRET_KEY"]
-ALGORITHM = config["JWT"]["ALGORITHM"]
 ACCESS_TOKEN_EXPIRE_MINUTES = int(config["JWT"]["ACCESS_TOKEN_EXPIRE_MINUTES"])
 REFRESH_TOKEN_EXPIRE_MINUTES = int(config["JWT"]["REFRESH_TOKEN_EXPIRE_MINUTES"])
+INTROSPECTION_MAX_BATCH = int(config["INTROSPECTION"]["MAX_BATCH"])
+BULK_REGISTRATION_BATCH_SIZE = int(config["BULK_REGISTRATION"]["BATCH_SIZE"])
+BULK_REGISTRATION_MAX_LINE_BYTES = int(config["BULK_REGISTRATION"]["MAX_LINE_BYTES"])
+AUDIT_PAGE_SIZE = int(config["AUDIT"]["PAGE_SIZE"])
+AUDIT_MAX_PAGE_SIZE = int(config["AUDIT"]["MAX_PAGE_SIZE"])
 
 logger = logging.getLogger(__name__)
 
+# Strong references to fire-and-forget tasks, and the users being rehashed
+_background_tasks: set[asyncio.Task] = set()
+_rehashing_user_ids: set[int] = set()
 
-async def register_new_user(user: UserReq, db: Session) -> UserRes:
 
-    existing_user = database.get_user_by_email(db, user.email)
-    if existing_user:
+async def register_new_user(user: UserReq, db: AsyncSession) -> UserRes:
+
+    if await database.user_exists_by_email(db, user.email):
         raise InteropAEException(
             message={
                 "message": f"User with email {user.email} already exists",
@@ -42,29 +65,177 @@ async def register_new_user(user: UserReq, db: Session) -> UserRes:
     else:
         password = _generate_random_password()
         print(f"Password: {password}")
-        hashed_pwd = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+        try:
+            hashed_pwd = await password_hasher.hash_password(password)
+        except RetryLaterException as e:
+            raise _retry_later_for(e, "user") from e
         new_user: User = User(**user.model_dump(exclude={"role_name"}), password=hashed_pwd)
-        role: Role = database.get_role_by_role_name(db, user.role_name)
+        role: Role = await database.get_role_by_role_name(db, user.role_name)
         new_user.roles = [
             UserRoles(
                 role_id=role.role_id, user_id=new_user.user_id, is_active=True
             )
         ]
-        # await _send_email(user, password)
-        database.create_new_user(db, new_user)
+        email_dispatcher.enqueue(db, user.user_name, user.email, password)
+        await database.create_new_user(db, new_user)
+        email_dispatcher.notify()
+        await user_profile_cache.invalidate(user_id=new_user.user_id, email=new_user.email)
         return UserRes(
             userId=str(new_user.user_id),
             userName=new_user.user_name,
             email=new_user.email,
-            roleId=str(new_user.roles[0].role_id),
+            roleId=str(role.role_id),
         )
 
 
-async def login_user(login: LoginReq, db: Session) -> TokenDetails:
+async def register_users_in_bulk(body: AsyncIterator[bytes], is_csv: bool) -> AsyncIterator[bytes]:
+    """Registers users from an NDJSON or CSV stream, yielding one NDJSON result per row.
+
+    Rows are handled in batches of BULK_REGISTRATION_BATCH_SIZE, so memory
+    stays bounded by the batch size rather than the upload size.
+    """
+    async with SessionLocal() as db:
+        role_ids = await database.get_role_ids_by_name(db)
+        batch = []
+        async for row_number, row in _iter_rows(body, is_csv):
+            batch.append((row_number, row))
+            if len(batch) >= BULK_REGISTRATION_BATCH_SIZE:
+                for result in await _register_batch(db, batch, role_ids):
+                    yield json.dumps(result).encode("utf-8") + b"\n"
+                batch = []
+        if batch:
+            for result in await _register_batch(db, batch, role_ids):
+                yield json.dumps(result).encode("utf-8") + b"\n"
+
+
+async def _iter_rows(body: AsyncIterator[bytes], is_csv: bool) -> AsyncIterator[tuple[int, dict | None]]:
+    header = None
+    row_number = 0
+    async for line in _iter_lines(body, BULK_REGISTRATION_MAX_LINE_BYTES):
+        if line is None:
+            row_number += 1
+            yield row_number, None
+            continue
+        if not line.strip():
+            continue
+        if is_csv and header is None:
+            header = [column.strip() for column in next(csv.reader([line]))]
+            continue
+        row_number += 1
+        try:
+            row = dict(zip(header, next(csv.reader([line])))) if is_csv else json.loads(line)
+        except (ValueError, StopIteration):
+            row = None
+        yield row_number, row if isinstance(row, dict) else None
+
+
+def _decode_line(line: bytes) -> str | None:
+    try:
+        return line.decode("utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        return None
+
+
+async def _iter_lines(body: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[str | None]:
+    """Yields decoded lines, and None in place of a line longer than max_line_bytes or not valid UTF-8.
+
+    An over-long line is dropped as it streams in rather than buffered, so
+    memory stays bounded even by input with no newlines at all.
+    """
+    buffer = b""
+    skipping = False
+    async for chunk in body:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if skipping or len(line) > max_line_bytes:
+                skipping = False
+                yield None
+            else:
+                yield _decode_line(line)
+        if len(buffer) > max_line_bytes:
+            buffer = b""
+            skipping = True
+    if skipping:
+        yield None
+    elif buffer:
+        yield _decode_line(buffer)
+
+
+async def _register_batch(db: AsyncSession, batch: list[tuple[int, dict | None]], role_ids: dict[str, int]) -> list[dict]:
+    results = {}
+    new_users: dict[int, UserReq] = {}
+    emails = set()
+    for row_number, row in batch:
+        try:
+            user = UserReq(**row) if row is not None else None
+        except ValidationError:
+            user = None
+        if user is None:
+            results[row_number] = {"row": row_number, "email": None, "status": "invalid", "userId": None}
+        elif user.role_name not in role_ids:
+            results[row_number] = {"row": row_number, "email": user.email, "status": "unknown_role", "userId": None}
+        elif user.email in emails:
+            results[row_number] = {"row": row_number, "email": user.email, "status": "duplicate", "userId": None}
+        else:
+            emails.add(user.email)
+            new_users[row_number] = user
+
+    existing_emails = await database.get_existing_emails(db, list(emails)) if emails else set()
+    for row_number, user in list(new_users.items()):
+        if user.email in existing_emails:
+            results[row_number] = {"row": row_number, "email": user.email, "status": "duplicate", "userId": None}
+            del new_users[row_number]
+
+    if new_users:
+        passwords = [_generate_random_password() for _ in new_users]
+        try:
+            hashed_pwds = await password_hasher.hash_passwords(passwords)
+        except RetryLaterException:
+            # The hashing pool is saturated; these rows can be resubmitted later
+            for row_number, user in new_users.items():
+                results[row_number] = {"row": row_number, "email": user.email, "status": "retry_later", "userId": None}
+            return [results[row_number] for row_number, _ in batch]
+        users = {
+            row_number: User(
+                **user.model_dump(exclude={"role_name"}),
+                password=hashed_pwd,
+                roles=[UserRoles(role_id=role_ids[user.role_name], is_active=True)],
+            )
+            for (row_number, user), hashed_pwd in zip(new_users.items(), hashed_pwds)
+        }
+        for user, password in zip(new_users.values(), passwords):
+            email_dispatcher.enqueue(db, user.user_name, user.email, password)
+        try:
+            await database.create_new_users(db, list(users.values()))
+            email_dispatcher.notify()
+            status = "created"
+        except SQLAlchemyError as e:
+            logger.error(f"\t===== Error while registering users =====\nReason: {e}")
+            await db.rollback()
+            status = "failed"
+        for row_number, user in users.items():
+            results[row_number] = {
+                "row": row_number,
+                "email": user.email,
+                "status": status,
+                "userId": str(user.user_id) if status == "created" else None,
+            }
+            await user_profile_cache.invalidate(email=user.email)
+    return [results[row_number] for row_number, _ in batch]
+
+
+async def login_user(login: LoginReq, db: AsyncSession, client_ip: str | None = None) -> TokenDetails:
 
-    user = database.get_user_by_email(db, login.email)
+    try:
+        await login_throttle.check(login.email, client_ip)
+    except RetryLaterException:
+        audit_log.record(audit.LOGIN_THROTTLED, email=login.email, client_ip=client_ip)
+        raise
+    user = await database.get_user_credentials_by_email(db, login.email)
 
     if not user:
+        audit_log.record(audit.LOGIN_FAILURE, email=login.email, client_ip=client_ip, detail="unknown_email")
         raise InteropAEException(
             message={
                 "message": f"Invalid credentials: User with email {login.email} does not exist in our records",
@@ -72,9 +243,14 @@ async def login_user(login: LoginReq, db: Session) -> TokenDetails:
             },
             status_code=401,
         )
-    if not bcrypt.checkpw(
-        login.password.encode("utf-8"), user.password.encode("utf-8")
-    ):
+    try:
+        password_matches = await password_hasher.check_password(login.password, user.password)
+    except RetryLaterException as e:
+        raise _retry_later_for(e, "token") from e
+    if not password_matches:
+        audit_log.record(
+            audit.LOGIN_FAILURE, user.user_id, login.email, client_ip=client_ip, detail="wrong_password"
+        )
         raise InteropAEException(
             message={
                 "message": f"Invalid credentials: Password does not match",
@@ -82,32 +258,43 @@ async def login_user(login: LoginReq, db: Session) -> TokenDetails:
             },
             status_code=401,
         )
-    print(user.actual_roles[0].role_name)
-    access_token = _create_access_token(data={"sub": user.email, "id": user.user_id, "role": user.actual_roles[0].role_name})
-    # Revoke existing refresh tokens
-    existing_refresh_tokens = database.get_non_revoked_token_details_by_user_id(db, user.user_id)
-    for token in existing_refresh_tokens:
-        token.is_revoked = True
-        database.update_token(db, token)
-
-    # Generate new refresh token and store it in the database
+    if password_hasher.needs_rehash(user.password) and user.user_id not in _rehashing_user_ids:
+        _rehashing_user_ids.add(user.user_id)
+        _run_in_background(_rehash_password(user.user_id, login.password, user.password))
+    # Revoke existing refresh tokens and store the new one in a single transaction
     refresh_token = uuid4().hex
     new_token = Token(
-        refresh_token=refresh_token,
+        refresh_token_hash=database.hash_refresh_token(refresh_token),
         expiration_time=datetime.now()
         + timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES),
         user_id=user.user_id,
         is_revoked=False,
     )
-    database.create_new_refresh_token(db, new_token)
+    access_token = _create_access_token(
+        data={"sub": user.email, "id": user.user_id, "role": user.role_name},
+        jti=database.access_token_id(new_token.refresh_token_hash),
+    )
+    revoked_until = _access_token_expiry()
+    revoked_jtis = await database.replace_refresh_tokens(db, user.user_id, new_token, revoked_until)
+    _deny_access_tokens(revoked_jtis, revoked_until)
+    audit_log.record(audit.LOGIN_SUCCESS, user.user_id, user.email, client_ip=client_ip)
     return TokenDetails(accessToken=access_token, refreshToken=refresh_token)
 
 
-async def create_access_token_from_refresh_token(refresh_token: str, db: Session) -> TokenDetails:
-    token = database.get_valid_refresh_token(db, refresh_token)
+async def create_access_token_from_refresh_token(
+    refresh_token: str, db: AsyncSession, client_ip: str | None = None
+) -> TokenDetails:
+    # Parallel retries of one refresh token share a single rotation and all
+    # receive the same new token pair, instead of all but one getting a 401
+    return await refresh_flight.do(refresh_token, lambda: _rotate_refresh_token(refresh_token, db, client_ip))
+
+
+async def _rotate_refresh_token(refresh_token: str, db: AsyncSession, client_ip: str | None) -> TokenDetails:
+    token = await database.revoke_refresh_token(db, refresh_token)
     # If token is not found or expired, raise an exception
 
     if not token:
+        audit_log.record(audit.REFRESH_FAILURE, client_ip=client_ip, detail="unknown_token")
         raise InteropAEException(
             message={
                 "message": f"Invalid token: Refresh token is invoked. Please login with your credentials again",
@@ -115,9 +302,9 @@ async def create_access_token_from_refresh_token(refresh_token: str, db: Session
             },
             status_code=401,
         )   
-    token.is_revoked = True
-    database.update_token(db, token)
     if datetime.now() > token.expiration_time:
+        await db.commit()
+        audit_log.record(audit.REFRESH_FAILURE, token.user_id, client_ip=client_ip, detail="expired_token")
         raise InteropAEException(
             message={
                 "message": f"Invalid token: Refresh token is expired. Please login with your credentials again",
@@ -126,29 +313,49 @@ async def create_access_token_from_refresh_token(refresh_token: str, db: Session
             status_code=401,
         )
 
-    # If token is valid, generate a new access token and refresh token
-    user = database.get_user_by_id(db, token.user_id)
-    access_token = _create_access_token(
-        data={"sub": user.email, "id": user.user_id, "role": user.actual_roles[0].role_name}
-    )
-    refresh_token = uuid4().hex
+    # If token is valid, generate a new access token and refresh token; the
+    # revoke above is committed together with the new token
+    user = await database.get_user_summary_by_id(db, token.user_id)
+    refresh_token, old_refresh_token = uuid4().hex, refresh_token
     new_token = Token(
-        refresh_token=refresh_token,
+        refresh_token_hash=database.hash_refresh_token(refresh_token),
         expiration_time=datetime.now()
         + timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES),
         user_id=user.user_id,
         is_revoked=False,
     )
-    database.create_new_refresh_token(db, new_token)
+    access_token = _create_access_token(
+        data={"sub": user.email, "id": user.user_id, "role": user.role_name},
+        jti=database.access_token_id(new_token.refresh_token_hash),
+    )
+    # The access token minted with the rotated refresh token is revoked with it
+    revoked_jtis = [database.access_token_id(database.hash_refresh_token(old_refresh_token))]
+    revoked_until = _access_token_expiry()
+    database.add_revoked_access_tokens(db, revoked_jtis, revoked_until)
+    await database.create_new_refresh_token(db, new_token)
+    _deny_access_tokens(revoked_jtis, revoked_until)
+    audit_log.record(audit.REFRESH, user.user_id, user.email, client_ip=client_ip)
     return TokenDetails(accessToken=access_token, refreshToken=refresh_token)
 
 
-async def fetch_user_details(user_cred: str, db: Session):
+async def fetch_user_details(user_cred: str, db: AsyncSession):
+    return await user_details_flight.do(user_cred, lambda: _load_user_details(user_cred, db))
+
+
+async def _load_user_details(user_cred: str, db: AsyncSession):
     existing_user = None
-    if _is_valid_email(user_cred):
-        existing_user = database.get_user_by_email(db, user_cred)
+    is_email = _is_valid_email(user_cred)
+    if is_email:
+        cached_user = await user_profile_cache.get_by_email(user_cred)
+    else:
+        cached_user = await user_profile_cache.get_by_id(user_cred)
+    if cached_user:
+        return cached_user
+
+    if is_email:
+        existing_user = await database.get_user_summary_by_email(db, user_cred)
     else:
-        existing_user = database.get_user_by_id(db, user_cred)
+        existing_user = await database.get_user_summary_by_id(db, user_cred)
     if not existing_user:
         raise InteropAEException(
             message={
@@ -157,21 +364,107 @@ async def fetch_user_details(user_cred: str, db: Session):
             },
             status_code=404,
         )
-    return UserRes(
+    user_details = UserRes(
         userId=str(existing_user.user_id),
         userName=existing_user.user_name,
         email=existing_user.email,
-        roleId=str(existing_user.roles[0].role_id),
+        roleId=str(existing_user.role_id),
     )
+    await user_profile_cache.put(user_details)
+    return user_details
 
-async def logout_user(user_id: str, db: Session):
-    database.delete_refresh_tokens(db, user_id)
+async def logout_user(user_id: str, db: AsyncSession, jti: str | None = None, client_ip: str | None = None):
+    revoked_until = _access_token_expiry()
+    revoked_jtis = await database.delete_refresh_tokens(db, user_id, revoked_until)
+    if jti and jti not in revoked_jtis:
+        database.add_revoked_access_tokens(db, [jti], revoked_until)
+        await db.commit()
+        revoked_jtis.append(jti)
+    _deny_access_tokens(revoked_jtis, revoked_until)
+    audit_log.record(audit.LOGOUT, user_id, client_ip=client_ip)
     return "User logged out successfully!"
 
 
-async def fetch_all_credentials(db: Session):
-    credentials = database.get_credentials(db)
-    return {creds.credential_name: creds.credential_value for creds in credentials}
+async def introspect_tokens(tokens: list[str]) -> list[TokenIntrospection]:
+    if len(tokens) > INTROSPECTION_MAX_BATCH:
+        raise InteropAEException(
+            message={
+                "message": f"Too many tokens: at most {INTROSPECTION_MAX_BATCH} can be introspected per request",
+                "tokens": None,
+            },
+            status_code=400,
+        )
+    now = time.time()
+    results = []
+    for token in tokens:
+        # One bad token must not fail the whole batch, whatever it raises
+        try:
+            token_status, payload = verify_access_token(token)
+            if token_status == ACTIVE:
+                results.append(
+                    TokenIntrospection(
+                        active=True,
+                        status=token_status,
+                        claims=payload,
+                        expiresIn=max(0, int(payload["exp"] - now)),
+                    )
+                )
+                continue
+        except Exception as e:
+            logger.warning(f"\t===== Error while introspecting a token =====\nReason: {e!r}")
+            token_status = INVALID
+        results.append(TokenIntrospection(active=False, status=token_status))
+    return results
+
+
+async def fetch_audit_events(
+    requester: dict,
+    db: AsyncSession,
+    user_id: int | None = None,
+    event_type: str | None = None,
+    before: int | None = None,
+    limit: int | None = None,
+) -> tuple[list[AuditEventRes], int | None]:
+    # Admins can read everyone's history, other users only their own
+    if requester.get("role") != "Admin":
+        if user_id is not None and user_id != requester["id"]:
+            raise InteropAEException(
+                message={
+                    "message": "Forbidden Access: User does not have permission to access this resource",
+                    "events": None,
+                },
+                status_code=403,
+            )
+        user_id = requester["id"]
+    if limit is None:
+        limit = AUDIT_PAGE_SIZE
+    if not 1 <= limit <= AUDIT_MAX_PAGE_SIZE:
+        raise InteropAEException(
+            message={
+                "message": f"limit must be between 1 and {AUDIT_MAX_PAGE_SIZE}",
+                "events": None,
+            },
+            status_code=400,
+        )
+    rows = await database.get_audit_events(db, user_id, event_type, before, limit)
+    events = [
+        AuditEventRes(
+            eventId=row.event_id,
+            eventType=row.event_type,
+            userId=row.user_id,
+            email=row.email,
+            clientIp=row.client_ip,
+            detail=row.detail,
+            occurredAt=row.occurred_at,
+        )
+        for row in rows
+    ]
+    # A full page may have more below it; the cursor is the last event_id returned
+    return events, events[-1].eventId if len(events) == limit else None
+
+
+async def fetch_all_credentials(db: AsyncSession) -> tuple[dict[str, str], str]:
+    return await credentials_cache.get(db)
     
 
 def _generate_random_password(length=16):
@@ -189,46 +482,55 @@ def _generate_random_password(length=16):
     return "".join(password)
 
 
-def _create_access_token(data: dict):
+def _retry_later_for(ex: RetryLaterException, result_key: str) -> RetryLaterException:
+    # The hasher's busy message is endpoint-neutral; add the empty result field
+    # this endpoint's envelope normally carries
+    return RetryLaterException(
+        message={**ex.message, result_key: None}, status_code=ex.status_code, retry_after=ex.retry_after
+    )
+
+
+def _run_in_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _rehash_password(user_id: int, password: str, old_hashed_pwd: str):
+    # Runs after the login response; a failure just leaves the old hash for the next login
+    try:
+        hashed_pwd = await password_hasher.hash_password(password)
+        async with SessionLocal() as db:
+            if await database.update_user_password(db, user_id, old_hashed_pwd, hashed_pwd):
+                logger.info(f"Rehashed password of user {user_id} at cost {password_hasher.rounds}")
+    except Exception as e:
+        logger.warning(f"\t===== Error while rehashing password of user {user_id} =====\nReason: {e}")
+    finally:
+        _rehashing_user_ids.discard(user_id)
+
+
+def _access_token_expiry() -> datetime:
+    # Aware UTC: PyJWT reads naive datetimes as UTC, while .timestamp() reads them as local time
+    return datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+def _deny_access_tokens(jtis: list[str], revoked_until: datetime):
+    # Other workers pick these up from the revoked_access_token table on their next sync
+    for jti in jtis:
+        access_denylist.add(jti, revoked_until.timestamp())
+
+
+def _create_access_token(data: dict, jti: str):
     to_encode = data.copy()
-    expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    expire = _access_token_expiry()
+    to_encode.update({"exp": expire, "jti": jti})
+    with metrics.stage("jwt_encode"):
+        encoded_jwt = jwt.encode(
+            to_encode, key_ring.signing_key, algorithm=key_ring.algorithm, headers={"kid": key_ring.active_kid}
+        )
     return encoded_jwt
 
 
 def _is_valid_email(email: str) -> bool:
     pattern = r"^[\w\.-]+@[\w\.-]+\.\w+$"
     return re.match(pattern, email) is not None
-
-
-async def _send_email(user: UserReq, password: str):
-    env = Environment(loader=FileSystemLoader("templates"))
-    template = env.get_template("send_password.html")
-    html_body = template.render(
-        name=user.user_name,
-        email=user.email,
-        password=password,
-        title="Team PwC, India"
-    )
-
-    logic_app_url = "https://prod-16.centralindia.logic.azure.com:443/workflows/804301f846874454be13d04afedbae72/triggers/manual/paths/invoke?api-version=2016-10-01&sp=%2Ftriggers%2Fmanual%2Frun&sv=1.0&sig=jBoAsrpe_vNzfqmLs6lzNMA_GqvOokOVCtaubjwCCKg"
-    payload = {
-        "to": user.email,
-        "subject": "InteropAE Registration",
-        "email_body": html_body
-    }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(logic_app_url, json=payload)
-            response.raise_for_status()
-            logger.info("Email sent successfully")
-        except Exception as e:
-            logger.error(f"\t===== Error while sending mail =====\nReason: {e}")
-            raise InteropAEException(
-                message={
-                    "message": "Failed to send email",
-                    "user": None,
-                },
-                status_code=500,
-            )
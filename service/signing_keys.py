@@ -0,0 +1,101 @@
+import configparser
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+import orjson
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+ALGORITHM = config["JWT"]["ALGORITHM"]
+SIGNING_KEYS_DIR = Path(os.getenv("JWT_SIGNING_KEYS_DIR") or config["JWT"]["SIGNING_KEYS_DIR"])
+ACTIVE_KID = config["JWT"]["ACTIVE_KID"]
+JWKS_MAX_AGE_SECONDS = int(config["JWT"]["JWKS_MAX_AGE_SECONDS"])
+# Development only: every instance that generates its own key signs under the
+# same kid with a different key, so tokens stop verifying across instances.
+JWT_GENERATE_MISSING_KEY = (os.getenv("JWT_GENERATE_MISSING_KEY") or config["JWT"]["GENERATE_MISSING_KEY"]).lower() == "true"
+SUPPORTED_ALGORITHMS = ["EdDSA", "RS256"]
+
+logger = logging.getLogger(__name__)
+
+
+def _generate_private_key(algorithm: str):
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    raise ValueError(f"Unsupported signing algorithm {algorithm}, use EdDSA or RS256")
+
+
+def _key_algorithm(public_key) -> str:
+    return "EdDSA" if isinstance(public_key, ed25519.Ed25519PublicKey) else "RS256"
+
+
+def _create_key_file(path: Path, algorithm: str) -> None:
+    pem = _generate_private_key(algorithm).private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        # O_EXCL: when several workers start together only one writes the key.
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return
+    with os.fdopen(fd, "wb") as key_file:
+        key_file.write(pem)
+    logger.warning(f"Generated new signing key {path}")
+
+
+class KeyRing:
+    """Private signing keys loaded from SIGNING_KEYS_DIR, one <kid>.pem per key.
+
+    The ACTIVE_KID key signs new tokens; every key in the directory stays valid
+    for verification and is published in the JWKS, so keys can be rotated by
+    adding a new file, switching ACTIVE_KID and removing the old file once the
+    tokens it signed have expired.
+    """
+
+    def __init__(self, keys_dir: Path, active_kid: str, algorithm: str, generate_missing: bool = False) -> None:
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+        active_path = keys_dir / f"{active_kid}.pem"
+        if not active_path.exists():
+            if not generate_missing:
+                raise FileNotFoundError(
+                    f"Signing key {active_path} is missing; provision it on every instance "
+                    f"(e.g. openssl genpkey -algorithm ed25519 -out {active_path})"
+                )
+            _create_key_file(active_path, algorithm)
+        self._private_keys = {
+            path.stem: serialization.load_pem_private_key(path.read_bytes(), password=None)
+            for path in sorted(keys_dir.glob("*.pem"))
+        }
+        self._public_keys = {kid: key.public_key() for kid, key in self._private_keys.items()}
+        # Each kid verifies with its own key type's algorithm only, whatever alg a token claims
+        self._algorithms = {kid: _key_algorithm(key) for kid, key in self._public_keys.items()}
+        self.jwks = orjson.dumps({"keys": [self._to_jwk(kid, key) for kid, key in self._public_keys.items()]})
+        self.jwks_etag = f'"{hashlib.sha256(self.jwks).hexdigest()}"'
+
+    def _to_jwk(self, kid: str, public_key) -> dict:
+        alg = self._algorithms[kid]
+        jwk = (OKPAlgorithm if alg == "EdDSA" else RSAAlgorithm).to_jwk(public_key, as_dict=True)
+        return {**jwk, "kid": kid, "use": "sig", "alg": alg}
+
+    @property
+    def signing_key(self):
+        return self._private_keys[self.active_kid]
+
+    def verification_key(self, kid: str | None):
+        """Returns (public key, algorithm) for a kid, or None for an unknown kid."""
+        if kid not in self._public_keys:
+            return None
+        return self._public_keys[kid], self._algorithms[kid]
+
+
+key_ring = KeyRing(SIGNING_KEYS_DIR, ACTIVE_KID, ALGORITHM, JWT_GENERATE_MISSING_KEY)
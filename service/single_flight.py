@@ -0,0 +1,78 @@
+import asyncio
+import configparser
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from service.metrics import metrics
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+SINGLE_FLIGHT_MAX_KEYS = int(config["SINGLE_FLIGHT"]["MAX_KEYS"])
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one in-flight task.
+
+    The first caller for a key runs fn; callers arriving while it runs await
+    the same task and get its result or exception. Keys are forgotten as soon
+    as the task finishes, so only in-flight keys are tracked, and at most
+    max_keys of them; beyond that calls simply run uncoalesced.
+    """
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._leaders = 0
+        self._coalesced = 0
+        self._overflow = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            if len(self._calls) >= self.max_keys:
+                self._overflow += 1
+                return await fn()
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._leaders += 1
+            # Awaited unshielded: if the leader is cancelled, so is its work
+            return await task
+
+        self._coalesced += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # The leader was cancelled rather than this caller, so run the call again
+            if task.cancelled() and not asyncio.current_task().cancelling():
+                return await self.do(key, fn)
+            raise
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    @property
+    def coalesced(self) -> int:
+        return self._coalesced
+
+    def stats(self) -> dict:
+        return {
+            "inFlight": len(self._calls),
+            "leaders": self._leaders,
+            "coalesced": self._coalesced,
+            "overflow": self._overflow,
+        }
+
+
+refresh_flight = SingleFlight(SINGLE_FLIGHT_MAX_KEYS)
+user_details_flight = SingleFlight(SINGLE_FLIGHT_MAX_KEYS)
+metrics.add_counter(
+    "refresh_coalesced_total", "Refresh calls that shared another in-flight refresh.",
+    lambda: refresh_flight.coalesced,
+)
+metrics.add_counter(
+    "user_details_coalesced_total", "User lookups that shared another in-flight lookup.",
+    lambda: user_details_flight.coalesced,
+)
@@ -0,0 +1,39 @@
+import logging
+import time
+from typing import Awaitable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class StartupReport:
+    """Time-to-ready breakdown: module imports, then each lifespan step."""
+
+    def __init__(self, import_started_at: float) -> None:
+        self.import_started_at = import_started_at
+        self.imported_at = time.perf_counter()
+        self.ready_at: float | None = None
+        self._steps: dict[str, float] = {}
+
+    async def step(self, name: str, awaitable: Awaitable[T]) -> T:
+        started_at = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self._steps[name] = time.perf_counter() - started_at
+
+    def ready(self) -> None:
+        self.ready_at = time.perf_counter()
+        steps = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self._steps.items())
+        logger.info(
+            f"Ready in {(self.ready_at - self.import_started_at) * 1000:.0f}ms "
+            f"(imports {(self.imported_at - self.import_started_at) * 1000:.0f}ms; {steps})"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "importMs": round((self.imported_at - self.import_started_at) * 1000, 3),
+            "stepsMs": {name: round(seconds * 1000, 3) for name, seconds in self._steps.items()},
+            "readyMs": round((self.ready_at - self.import_started_at) * 1000, 3) if self.ready_at else None,
+        }
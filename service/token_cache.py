@@ -0,0 +1,85 @@
+import configparser
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+TOKEN_CACHE_MAX_ENTRIES = int(config["TOKEN_CACHE"]["MAX_ENTRIES"])
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+
+class TokenCache:
+    """Bounded LRU of verified access token claims, keyed by a digest of the token."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[bytes, dict] = OrderedDict()
+        self._revocation_checks: list[Callable[[dict], bool]] = []
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evicted = 0
+        self._revoked = 0
+
+    def add_revocation_check(self, check: Callable[[dict], bool]) -> None:
+        self._revocation_checks.append(check)
+
+    def is_revoked(self, payload: dict) -> bool:
+        return any(check(payload) for check in self._revocation_checks)
+
+    def get(self, token: str) -> dict | None:
+        key = _digest(token)
+        payload = self._entries.get(key)
+        if payload is None:
+            self._misses += 1
+            return None
+        if payload["exp"] <= time.time():
+            del self._entries[key]
+            self._expired += 1
+            self._misses += 1
+            return None
+        if self.is_revoked(payload):
+            del self._entries[key]
+            self._revoked += 1
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        if self.max_entries <= 0 or "exp" not in payload:
+            return
+        key = _digest(token)
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evicted += 1
+
+    def invalidate(self, token: str) -> None:
+        self._entries.pop(_digest(token), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hitRatio": round(self._hits / lookups, 4) if lookups else 0.0,
+            "expired": self._expired,
+            "evicted": self._evicted,
+            "revoked": self._revoked,
+        }
+
+
+token_cache = TokenCache(TOKEN_CACHE_MAX_ENTRIES)
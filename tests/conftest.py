@@ -0,0 +1,76 @@
+"""Shared fixtures: every test runs against a throwaway SQLite database.
+
+The app modules read config.ini from the working directory and
+DATABASE_URL at import time, so both are set up before anything is imported;
+signing keys are generated into the same throwaway directory.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+os.chdir(ROOT)
+sys.path.insert(0, str(ROOT))
+_DATABASE_DIR = tempfile.mkdtemp(prefix="interopae-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DATABASE_DIR}/primary.db"
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ["JWT_SIGNING_KEYS_DIR"] = f"{_DATABASE_DIR}/keys"
+os.environ["JWT_GENERATE_MISSING_KEY"] = "true"
+
+import bcrypt  # noqa: E402
+
+from database import database  # noqa: E402
+from database.entity import Base, Role, User, UserRoles  # noqa: E402
+from service.hashing import password_hasher  # noqa: E402
+
+PASSWORD = "Test@12345"
+TEST_ROUNDS = 4
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _hashing_pool():
+    # Seeded hashes use the pinned test cost, so logins never trigger a rehash
+    password_hasher.is_pinned, password_hasher.rounds = True, TEST_ROUNDS
+    yield
+    password_hasher.shutdown()
+
+
+@pytest.fixture
+def run():
+    """Runs a coroutine on a fresh event loop, then drops the pooled connections bound to it."""
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await database.dispose_engines()
+
+        return asyncio.run(main())
+
+    return run
+
+
+async def _seed() -> None:
+    async with database.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    hashed_password = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(TEST_ROUNDS)).decode("utf-8")
+    async with database.SessionLocal() as db:
+        db.add_all([Role(role_id=1, role_name="User"), Role(role_id=2, role_name="Admin")])
+        db.add_all(
+            User(user_id=user_id, user_name=f"user{user_id}", email=f"user{user_id}@test.local", password=hashed_password)
+            for user_id in (1, 2)
+        )
+        db.add_all(UserRoles(user_id=user_id, role_id=1, is_active=True) for user_id in (1, 2))
+        await db.commit()
+
+
+@pytest.fixture
+def seeded(run):
+    run(_seed())
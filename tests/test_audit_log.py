@@ -0,0 +1,73 @@
+"""Audit events fit their columns, a batch the database rejects is discarded, and /audit pages are bounded."""
+
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import select
+
+from database.database import SessionLocal
+from database.entity import AuditEvent
+from main import app
+from service import service
+from service.audit_log import DROP_NEWEST, LOGIN_FAILURE, AuditLog
+from service.service import AUDIT_MAX_PAGE_SIZE
+
+
+def _audit_log() -> AuditLog:
+    return AuditLog(batch_size=2, flush_seconds=1, max_queue=10, overflow=DROP_NEWEST, drain_timeout=1)
+
+
+async def _events() -> list[AuditEvent]:
+    async with SessionLocal() as db:
+        return list((await db.execute(select(AuditEvent).order_by(AuditEvent.event_id))).scalars())
+
+
+def test_record_truncates_to_column_sizes(run, seeded):
+    audit_log = _audit_log()
+    audit_log.record(LOGIN_FAILURE, email="a" * 400 + "@test.local", client_ip="1" * 60, detail="x" * 200)
+    audit_log.record(LOGIN_FAILURE, email=None, client_ip="127.0.0.1", detail="bad password")
+
+    async def scenario():
+        written = await audit_log.flush()
+        return written, await _events()
+
+    written, [long_event, short_event] = run(scenario())
+    assert written == 2
+    assert (len(long_event.email), len(long_event.client_ip), len(long_event.detail)) == (320, 45, 128)
+    assert (short_event.email, short_event.client_ip, short_event.detail) == (None, "127.0.0.1", "bad password")
+
+
+def test_rejected_batch_is_discarded(run, seeded):
+    audit_log = _audit_log()
+    # event_type is NOT NULL, so this batch fails with an IntegrityError on every attempt
+    audit_log.record(None, user_id=1)
+    audit_log.record(LOGIN_FAILURE, user_id=1)
+    audit_log.record(LOGIN_FAILURE, user_id=2)
+
+    async def scenario():
+        written = await audit_log.flush()
+        return written, await _events()
+
+    written, events = run(scenario())
+    assert written == 1
+    assert [event.user_id for event in events] == [2]
+    stats = audit_log.stats()
+    assert (stats["queued"], stats["written"], stats["discarded"]) == (0, 1, 2)
+
+
+def test_audit_limit_is_range_checked(run, seeded):
+    token = service._create_access_token({"sub": "user1@test.local", "id": 1, "role": "User"}, jti=uuid4().hex)
+
+    async def fetch(params: dict) -> dict:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/audit", params=params, headers={"Authorization": f"Bearer {token}"})
+        return response.json()
+
+    async def scenario():
+        return [await fetch(params) for params in ({"limit": 0}, {"limit": AUDIT_MAX_PAGE_SIZE + 1}, {})]
+
+    zero, too_large, default = run(scenario())
+    assert (zero["statusCode"], too_large["statusCode"], default["statusCode"]) == (400, 400, 200)
+    assert zero["data"]["message"] == f"limit must be between 1 and {AUDIT_MAX_PAGE_SIZE}"
+    assert default["data"]["events"] == []
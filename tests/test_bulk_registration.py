@@ -0,0 +1,56 @@
+"""Bulk registration reports bad lines as invalid rows and keeps streaming."""
+
+import json
+
+import httpx
+
+from main import app
+from service.service import BULK_REGISTRATION_MAX_LINE_BYTES
+
+
+def _register_bulk(run, body: bytes, content_type: str) -> list[dict]:
+    async def post():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/register/bulk", content=body, headers={"Content-Type": content_type})
+
+    response = run(post())
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _statuses(results: list[dict]) -> list[tuple[int, str]]:
+    return [(result["row"], result["status"]) for result in results]
+
+
+def test_ndjson_bad_lines_are_invalid_rows(run, seeded):
+    body = b"\n".join([
+        json.dumps({"user_name": "alice", "email": "alice@test.local", "role_name": "User"}).encode("utf-8"),
+        b'{"user_name": "bad\xff\xfe", "email": "bad@test.local", "role_name": "User"}',
+        b"x" * (BULK_REGISTRATION_MAX_LINE_BYTES + 1),
+        b"not json",
+        json.dumps({"user_name": "bob", "email": "bob@test.local", "role_name": "User"}).encode("utf-8"),
+        b"\xc3",
+    ])
+    results = _register_bulk(run, body, "application/x-ndjson")
+    assert _statuses(results) == [
+        (1, "created"), (2, "invalid"), (3, "invalid"), (4, "invalid"), (5, "created"), (6, "invalid")
+    ]
+    assert [result["email"] for result in results if result["status"] == "created"] == [
+        "alice@test.local", "bob@test.local"
+    ]
+
+
+def test_csv_bad_lines_are_invalid_rows(run, seeded):
+    body = b"\r\n".join([
+        b"user_name,email,role_name",
+        b"carol,carol@test.local,User",
+        b"bad\xff,bad@test.local,User",
+        b"dave,dave@test.local,Owner",
+        b"user1,user1@test.local,User",
+        b"erin,erin@test.local,Admin",
+    ])
+    results = _register_bulk(run, body, "text/csv")
+    assert _statuses(results) == [
+        (1, "created"), (2, "invalid"), (3, "unknown_role"), (4, "duplicate"), (5, "created")
+    ]
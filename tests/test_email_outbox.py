@@ -0,0 +1,112 @@
+"""The dispatcher delivers outbox rows to the webhook, backing off and giving up on failures."""
+
+import json
+from datetime import datetime, timedelta
+
+import httpx
+from cryptography.fernet import Fernet
+from sqlalchemy import select, update
+
+from benchmark.stub_webhook import start_stub_webhook
+from database.database import SessionLocal
+from database.entity import EmailOutbox
+from service.email_outbox import EmailDispatcher, email_dispatcher
+
+BACKOFF_SECONDS = 10
+MAX_ATTEMPTS = 3
+PASSWORD = "Generated@123"
+
+
+def _dispatcher(webhook_url: str) -> EmailDispatcher:
+    return EmailDispatcher(True, webhook_url, Fernet.generate_key(), 2, 10, 0.1, MAX_ATTEMPTS, BACKOFF_SECONDS, 2)
+
+
+async def _enqueue(dispatcher: EmailDispatcher) -> None:
+    async with SessionLocal() as db:
+        dispatcher.enqueue(db, "user1", "user1@test.local", PASSWORD)
+        await db.commit()
+
+
+async def _outbox() -> list[EmailOutbox]:
+    async with SessionLocal() as db:
+        return list((await db.execute(select(EmailOutbox))).scalars())
+
+
+async def _make_due() -> None:
+    async with SessionLocal() as db:
+        await db.execute(update(EmailOutbox).values(next_attempt_at=datetime.now() - timedelta(seconds=1)))
+        await db.commit()
+
+
+def test_disabled_by_default_queues_nothing(run, seeded):
+    async def scenario():
+        await _enqueue(email_dispatcher)
+        return await _outbox()
+
+    assert email_dispatcher.enabled is False
+    assert run(scenario()) == []
+
+
+def test_sent_email_is_deleted(run, seeded):
+    server, url = start_stub_webhook()
+    dispatcher = _dispatcher(url)
+
+    async def scenario():
+        await _enqueue(dispatcher)
+        [queued] = await _outbox()
+        async with httpx.AsyncClient() as client:
+            dispatcher._client = client
+            handled = await dispatcher.dispatch_batch()
+        return queued, handled, await _outbox()
+
+    try:
+        queued, handled, rows = run(scenario())
+    finally:
+        server.shutdown()
+    # Only the ciphertext is stored; the webhook gets the rendered email
+    assert PASSWORD not in queued.body
+    assert PASSWORD in json.loads(server.RequestHandlerClass.last_body)["email_body"]
+    assert handled == 1
+    assert rows == []
+    assert server.RequestHandlerClass.received == 1
+    assert dispatcher.stats()["sent"] == 1
+
+
+def test_failed_email_backs_off_then_gives_up(run, seeded):
+    server, url = start_stub_webhook(status=500)
+    dispatcher = _dispatcher(url)
+
+    async def scenario():
+        await _enqueue(dispatcher)
+        history = []
+        async with httpx.AsyncClient() as client:
+            dispatcher._client = client
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                if attempt > 1:
+                    # Not due until its backoff has passed
+                    assert await dispatcher.dispatch_batch() == 0
+                    await _make_due()
+                dispatched_at = datetime.now()
+                assert await dispatcher.dispatch_batch() == 1
+                [row] = await _outbox()
+                history.append((dispatched_at, row))
+            await _make_due()
+            # A failed row is never claimed again
+            assert await dispatcher.dispatch_batch() == 0
+        return history
+
+    try:
+        history = run(scenario())
+    finally:
+        server.shutdown()
+    assert server.RequestHandlerClass.received == MAX_ATTEMPTS
+    for attempt, (dispatched_at, row) in enumerate(history, start=1):
+        assert row.attempts == attempt
+        assert row.claimed_by is None
+        assert "500" in row.last_error
+        backoff = timedelta(seconds=BACKOFF_SECONDS * 2 ** (attempt - 1))
+        assert dispatched_at + backoff <= row.next_attempt_at <= datetime.now() + backoff
+        assert row.is_failed == (attempt == MAX_ATTEMPTS)
+        assert (row.body == "") == (attempt == MAX_ATTEMPTS)
+    assert history[0][1].body and PASSWORD not in history[0][1].body
+    assert dispatcher.stats() == {"enabled": True, "concurrency": 2, "sent": 0, "retried": MAX_ATTEMPTS - 1, "failed": 1}
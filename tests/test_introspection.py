@@ -0,0 +1,54 @@
+"""Batch introspection answers every token, whatever is wrong with the others."""
+
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import httpx
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from main import app
+from service import service
+from service.denylist import access_denylist
+from service.signing_keys import key_ring
+
+
+def _signed(claims: dict) -> str:
+    return jwt.encode(claims, key_ring.signing_key, algorithm=key_ring.algorithm, headers={"kid": key_ring.active_kid})
+
+
+def test_introspect_mixed_batch(run):
+    valid = service._create_access_token({"sub": "user1@test.local", "id": 1}, jti=uuid4().hex)
+    expired = _signed({"sub": "user1@test.local", "exp": datetime.now(timezone.utc) - timedelta(minutes=1)})
+    revoked_jti = uuid4().hex
+    revoked = service._create_access_token({"sub": "user1@test.local", "id": 1}, jti=revoked_jti)
+    access_denylist.add(revoked_jti, (datetime.now(timezone.utc) + timedelta(minutes=5)).timestamp())
+    # Claims RS256 with the active EdDSA kid
+    forged = jwt.encode(
+        {"sub": "user1@test.local"},
+        rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        algorithm="RS256",
+        headers={"kid": key_ring.active_kid},
+    )
+    no_expiry = _signed({"sub": "user1@test.local"})
+
+    async def introspect():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/introspect/batch", json={"tokens": [valid, expired, revoked, "not-a-token", forged, no_expiry]}
+            )
+
+    response = run(introspect())
+    assert response.status_code == 200
+    results = response.json()["data"]["tokens"]
+    assert [(result["active"], result["status"]) for result in results] == [
+        (True, "active"),
+        (False, "expired"),
+        (False, "revoked"),
+        (False, "invalid"),
+        (False, "invalid"),
+        (False, "invalid"),
+    ]
+    assert results[0]["claims"]["id"] == 1 and 0 < results[0]["expiresIn"] <= service.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    assert all(result["claims"] is None for result in results[1:])
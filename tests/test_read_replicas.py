@@ -0,0 +1,112 @@
+"""Routed sessions read from a replica, read their own writes, and survive a replica outage."""
+
+import os
+import shutil
+import time
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import database
+from database.database import ReplicaRouter, RoutedSessionLocal
+from database.entity import User
+
+COOLDOWN_SECONDS = 0.2
+
+
+@pytest.fixture
+def replica_path(seeded, tmp_path):
+    """A copy of the seeded primary whose user 1 is renamed, so reads show which file answered."""
+    path = tmp_path / "replica.db"
+    shutil.copyfile(database.engine.url.database, path)
+    return path
+
+
+def _rename_user_1(run, path) -> None:
+    async def rename():
+        replica = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        async with replica.begin() as conn:
+            await conn.execute(update(User).where(User.user_id == 1).values(user_name="replica"))
+        await replica.dispose()
+
+    run(rename())
+
+
+def _route_to(monkeypatch, path) -> ReplicaRouter:
+    replica = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    router = ReplicaRouter(database.engine, [replica], COOLDOWN_SECONDS)
+    monkeypatch.setattr(database, "replica_router", router)
+    return router
+
+
+async def _user_1_name() -> str:
+    async with RoutedSessionLocal() as db:
+        return await db.scalar(select(User.user_name).where(User.user_id == 1))
+
+
+def test_reads_go_to_the_replica(run, replica_path, monkeypatch):
+    _rename_user_1(run, replica_path)
+    router = _route_to(monkeypatch, replica_path)
+
+    async def scenario():
+        try:
+            return await _user_1_name()
+        finally:
+            await router.replicas[0].dispose()
+
+    assert run(scenario()) == "replica"
+    assert router.stats()["replicas"][0]["selected"] == 1
+    assert router.stats()["primaryFallbacks"] == 0
+
+
+def test_reads_after_a_write_go_to_the_primary(run, replica_path, monkeypatch):
+    _rename_user_1(run, replica_path)
+    router = _route_to(monkeypatch, replica_path)
+
+    async def scenario():
+        try:
+            async with RoutedSessionLocal() as db:
+                before = await db.scalar(select(User.user_name).where(User.user_id == 1))
+                await db.execute(update(User).where(User.user_id == 2).values(user_name="renamed"))
+                after = await db.scalar(select(User.user_name).where(User.user_id == 1))
+                own_write = await db.scalar(select(User.user_name).where(User.user_id == 2))
+                await db.rollback()
+            return before, after, own_write
+        finally:
+            await router.replicas[0].dispose()
+
+    assert run(scenario()) == ("replica", "user1", "renamed")
+
+
+def test_failing_replica_falls_back_then_recovers(run, replica_path, monkeypatch):
+    _rename_user_1(run, replica_path)
+    # The directory does not exist yet, so every connection attempt fails
+    unreachable_path = replica_path.parent / "unreachable" / "replica.db"
+    router = _route_to(monkeypatch, unreachable_path)
+
+    async def scenario():
+        try:
+            with pytest.raises(OperationalError):
+                await _user_1_name()
+            marked_down = router.stats()["replicas"][0]
+            during_outage = await _user_1_name()
+
+            os.makedirs(unreachable_path.parent)
+            shutil.copyfile(replica_path, unreachable_path)
+            still_cooling_down = await _user_1_name()
+            time.sleep(COOLDOWN_SECONDS)
+            recovered = await _user_1_name()
+            return marked_down, during_outage, still_cooling_down, recovered
+        finally:
+            await router.replicas[0].dispose()
+
+    marked_down, during_outage, still_cooling_down, recovered = run(scenario())
+    assert marked_down["healthy"] is False
+    assert marked_down["failures"] == 1
+    assert during_outage == "user1"
+    assert still_cooling_down == "user1"
+    assert recovered == "replica"
+    assert router.stats()["primaryFallbacks"] == 2
+    assert router.stats()["replicas"][0]["healthy"] is True
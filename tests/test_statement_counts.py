@@ -0,0 +1,56 @@
+"""Statements issued per request on the user read paths, counted at the cursor."""
+
+import httpx
+import pytest
+from sqlalchemy import event
+
+from conftest import PASSWORD
+from database import database
+from main import app
+from service.profile_cache import user_profile_cache
+
+
+@pytest.fixture
+def statements():
+    issued = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        issued.append(statement.lstrip().split(None, 1)[0].upper())
+
+    event.listen(database.engine.sync_engine, "before_cursor_execute", count)
+    yield issued
+    event.remove(database.engine.sync_engine, "before_cursor_execute", count)
+
+
+async def _request(client, statements, method, url, **kwargs):
+    statements.clear()
+    response = await client.request(method, url, **kwargs)
+    assert response.json()["statusCode"] == 200, response.text
+    return response.json()["data"], list(statements)
+
+
+def test_statements_per_request(run, seeded, statements):
+    async def scenario():
+        await user_profile_cache.invalidate(user_id=1, email="user1@test.local")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            data, login = await _request(
+                client, statements, "POST", "/login", json={"email": "user1@test.local", "password": PASSWORD}
+            )
+            # One joined user + role read, then revoke old tokens, deny their jtis, insert the new one
+            assert login == ["SELECT", "UPDATE", "INSERT"]
+
+            data, refresh = await _request(
+                client, statements, "POST", "/refresh", json={"refresh_token": data["token"]["refreshToken"]}
+            )
+            # Conditional revoke, one joined user read, then the denied jti and the new token
+            assert refresh == ["UPDATE", "SELECT", "INSERT", "INSERT"]
+
+            headers = {"Authorization": f"Bearer {data['token']['accessToken']}"}
+            _, user_details = await _request(client, statements, "GET", "/user/1", headers=headers)
+            assert user_details == ["SELECT"]
+            # The second read is served by the profile cache
+            _, cached = await _request(client, statements, "GET", "/user/1", headers=headers)
+            assert cached == []
+
+    run(scenario())
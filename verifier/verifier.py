@@ -0,0 +1,74 @@
+"""Local access-token verification for services downstream of InteropAE auth.
+
+Depends only on pyjwt[crypto] and httpx, so it can be copied or imported into
+other services:
+
+    verifier = JWKSVerifier("https://auth.example.com/.well-known/jwks.json")
+    claims = await verifier.verify(token)
+
+Signing keys are fetched from the JWKS endpoint and cached; a token signed
+with an unknown kid triggers at most one refetch per MIN_REFRESH_SECONDS, so
+key rotation is picked up without hammering the auth service.
+"""
+
+import asyncio
+import time
+
+import httpx
+import jwt
+
+CACHE_SECONDS = 300
+MIN_REFRESH_SECONDS = 30
+
+
+class JWKSVerifier:
+
+    def __init__(
+        self,
+        jwks_url: str,
+        cache_seconds: float = CACHE_SECONDS,
+        min_refresh_seconds: float = MIN_REFRESH_SECONDS,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self.jwks_url = jwks_url
+        self.cache_seconds = cache_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._client = client
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._etag: str | None = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def verify(self, token: str, **options) -> dict:
+        """Returns the token claims; raises jwt.InvalidTokenError subclasses like jwt.decode."""
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = await self._get_key(kid)
+        # Pinned to the key's own algorithm: a token cannot pick another one in its header
+        return jwt.decode(token, key.key, algorithms=[key.algorithm_name], **options)
+
+    async def _get_key(self, kid: str | None) -> jwt.PyJWK:
+        age = time.monotonic() - self._fetched_at
+        if age > self.cache_seconds or (kid not in self._keys and age > self.min_refresh_seconds):
+            async with self._lock:
+                age = time.monotonic() - self._fetched_at
+                if age > self.cache_seconds or (kid not in self._keys and age > self.min_refresh_seconds):
+                    await self._refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key {kid}")
+        return key
+
+    async def _refresh(self) -> None:
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        if self._client:
+            response = await self._client.get(self.jwks_url, headers=headers)
+        else:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(self.jwks_url, headers=headers)
+        self._fetched_at = time.monotonic()
+        if response.status_code == 304:
+            return
+        response.raise_for_status()
+        jwks = jwt.PyJWKSet.from_dict(response.json())
+        self._keys = {key.key_id: key for key in jwks.keys}
+        self._etag = response.headers.get("ETag")